@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Security
+
+from app.schemas.caches import Cache, Caches
+from app.utils.lifespan import clients
+from app.utils.security import check_api_key
+
+router = APIRouter()
+
+
+@router.get("/caches")
+async def caches(user: str = Security(check_api_key)) -> Caches:
+    """
+    Get the embeddings cache statistics of the worker since its start: vectors in memory, hits in memory and in Redis, misses and hit rate.
+    """
+    data = list()
+    if clients["embeddings_cache"]:
+        data.append(Cache(name="embeddings", **clients["embeddings_cache"].stats()))
+
+    return Caches(data=data)
@@ -1,14 +1,15 @@
-import httpx
-import json
 from typing import Union
 
-from fastapi import APIRouter, Security, HTTPException
+from fastapi import APIRouter, Depends, Security, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 
 from app.schemas.chat import ChatCompletionRequest, ChatCompletion, ChatCompletionChunk
-from app.utils.security import check_api_key
+from app.utils.security import check_api_key, get_priority
 from app.utils.lifespan import clients
 from app.utils.config import LOGGER
+from app.utils.upstream import forward_request, forward_stream
+from app.helpers import SSEFramer
 from app.tools import *
 from app.tools import __all__ as tools_list
 from app.schemas.config import LANGUAGE_MODEL_TYPE
@@ -18,7 +19,10 @@ router = APIRouter()
 
 @router.post("/chat/completions")
 async def chat_completions(
-    request: ChatCompletionRequest, user: str = Security(check_api_key)
+    request: ChatCompletionRequest,
+    response: Response,
+    user: str = Security(check_api_key),
+    priority: int = Depends(get_priority),
 ) -> Union[ChatCompletion, ChatCompletionChunk]:
     """Completion API similar to OpenAI's API.
     See https://platform.openai.com/docs/api-reference/chat/create for the API specification.
@@ -29,8 +33,9 @@ async def chat_completions(
     if client.type != LANGUAGE_MODEL_TYPE:
         raise HTTPException(status_code=400, detail="Model is not a language model")
 
-    url = f"{client.base_url}chat/completions"
-    headers = {"Authorization": f"Bearer {client.api_key}"}
+    limiter = clients["rate_limiter"]
+    headers = await limiter.check(user=user, model=request["model"], limits=client.rate_limits)
+    response.headers.update(headers)
 
     # tool call
     metadata = list()
@@ -51,38 +56,50 @@ async def chat_completions(
             request["messages"] = [{"role": "user", "content": tool_output.prompt}]
         request.pop("tools")
 
+    # deterministic requests are answered from cache
+    cache, key = clients["chat_completions_cache"], None
+    if cache:
+        key = cache.key(request=jsonable_encoder(request), metadata=jsonable_encoder(metadata))
+    if key:
+        data = await cache.get(key=key)
+        if data:
+            clients["usage"].record(user=user, model=request["model"], usage=data.get("usage"))
+        if data and not request["stream"]:
+            return ChatCompletion(**data)
+        if data:
+            return StreamingResponse(cache.replay(data=data), media_type="text/event-stream", headers=headers)  # fmt: off
+
     # non stream case
     if not request["stream"]:
-        async_client = httpx.AsyncClient(timeout=20)
-        response = await async_client.request(
-            method="POST",
-            url=url,
-            headers=headers,
-            json=request,
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = await forward_request(client=client, endpoint="chat/completions", request=request, priority=priority)  # fmt: off
         data["metadata"] = metadata
+        clients["usage"].record(user=user, model=request["model"], usage=data.get("usage"))
+        await limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=(data.get("usage") or {}).get("total_tokens"))  # fmt: off
+        if key and not any(choice["message"].get("tool_calls") for choice in data["choices"]):
+            await cache.set(key=key, data=jsonable_encoder(data))
         return ChatCompletion(**data)
 
-    # stream case
-    async def forward_stream(client, request: dict):
-        async with httpx.AsyncClient(timeout=20) as async_client:
-            async with async_client.stream(
-                method="POST",
-                url=url,
-                headers=headers,
-                json=request,
-            ) as response:
-                i = 0
-                async for chunk in response.aiter_raw():
-                    if i == 0:
-                        chunks = chunk.decode("utf-8").split("\n\n")
-                        chunk = json.loads(chunks[0].lstrip("data: "))
-                        chunk["metadata"] = metadata
-                        chunks[0] = f"data: {json.dumps(chunk)}"
-                        chunk = "\n\n".join(chunks).encode("utf-8")
-                        i = 1
-                    yield chunk
+    # stream case, metadata are spliced into the first event
+    stream_id = await limiter.open_stream(user=user, model=request["model"], limits=client.rate_limits)  # fmt: off
+    on_usage = lambda usage: limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=usage.get("total_tokens"))  # fmt: off
+    prompt_tokens = clients["usage"].estimate_tokens(request["messages"])
+    listener, close_usage = clients["usage"].recorder(user=user, model=request["model"], prompt_tokens=prompt_tokens, on_usage=on_usage)  # fmt: off
+    listeners = [listener]
+    if key:
+        listeners.append(cache.recorder(key=key, metadata=jsonable_encoder(metadata)))
+
+    # usage is requested to the model API, the usage-only event is hidden if the client did not ask for it
+    hidden = None
+    if not (request["stream_options"] or {}).get("include_usage"):
+        request["stream_options"] = (request["stream_options"] or {}) | {"include_usage": True}
+        hidden = clients["usage"].is_usage_event
+    framer = SSEFramer(metadata=jsonable_encoder(metadata), listeners=listeners, hidden=hidden)
+
+    async def on_close():
+        await close_usage()
+        await limiter.close_stream(user=user, model=request["model"], stream_id=stream_id)
+
+    response = await forward_stream(client=client, endpoint="chat/completions", request=request, framer=framer, priority=priority, on_close=on_close)  # fmt: off
+    response.headers.update(headers)
 
-    return StreamingResponse(forward_stream(client, request), media_type="text/event-stream")
+    return response
@@ -1,16 +1,33 @@
 from typing import Union, Optional
 
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, HTTPException, Query, Security
+from fastapi.responses import StreamingResponse
 from qdrant_client.http.models import Filter, HasIdCondition
 
 from app.schemas.chunks import Chunks, Chunk, ChunkRequest
 from app.utils.security import check_api_key
 from app.utils.lifespan import clients
-from app.utils.data import get_chunks, get_collection
+from app.utils.data import get_chunks, get_collection, iter_chunks
 
 router = APIRouter()
 
 
+@router.get("/chunks/{collection}/export")
+async def export_chunks(collection: str, user: str = Security(check_api_key)) -> StreamingResponse:
+    """
+    Export all the chunks of a collection, as newline delimited JSON (one chunk per line).
+    """
+    collection = await get_collection(
+        cache=clients["collections"], collection=collection, user=user
+    )
+
+    async def generator():
+        async for chunk in iter_chunks(vectorstore=clients["vectors"], collection=collection.id):
+            yield chunk.model_dump_json() + "\n"
+
+    return StreamingResponse(generator(), media_type="application/x-ndjson")
+
+
 @router.get("/chunks/{collection}/{chunk}")
 @router.post("/chunks/{collection}")
 async def chunks(
@@ -25,10 +42,31 @@ async def chunks(
 
     ids = [chunk] if chunk else dict(request)["ids"]
     filter = Filter(must=[HasIdCondition(has_id=ids)])
-    collection = get_collection(vectorstore=clients["vectors"], collection=collection, user=user)
+    collection = await get_collection(
+        cache=clients["collections"], collection=collection, user=user
+    )
 
-    chunks = get_chunks(vectorstore=clients["vectors"], collection=collection.id, filter=filter)
+    chunks = [chunk async for chunk in iter_chunks(vectorstore=clients["vectors"], collection=collection.id, filter=filter)]  # fmt: off
     if not request:
+        if not chunks:
+            raise HTTPException(status_code=404, detail="chunk not found.")
         return chunks[0]
 
     return Chunks(data=chunks)
+
+
+@router.get("/chunks/{collection}")
+async def list_chunks(
+    collection: str,
+    limit: int = Query(default=100, ge=1, le=1000),
+    after: Optional[str] = None,
+    user: str = Security(check_api_key),
+) -> Chunks:
+    """
+    Get the chunks of a collection, page by page. Pass the `after` cursor returned with a page to get the next page.
+    """
+    collection = await get_collection(
+        cache=clients["collections"], collection=collection, user=user
+    )
+
+    return await get_chunks(vectorstore=clients["vectors"], collection=collection.id, limit=limit, after=after)  # fmt: off
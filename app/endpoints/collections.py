@@ -1,20 +1,73 @@
+import asyncio
 from typing import Union, Optional
+import uuid
 
-from fastapi import APIRouter, Security, Response
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Security, Response
+from fastapi.responses import JSONResponse
 
-from app.schemas.collections import Collections, Collection
+from app.schemas.collections import Collections, Collection, CollectionRequest
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE, PRIVATE_COLLECTION_TYPE, Index
 from app.utils.security import check_api_key
 from app.utils.lifespan import clients
 from app.utils.data import (
     get_collections as _get_collections,
     get_collection as _get_collection,
+    create_collection as _create_collection,
     delete_contents,
+    get_deletable_collections,
 )
-from app.utils.config import LOGGER
+from app.utils.jobs import create_job, run_job
+from app.utils.config import CONFIG, LOGGER
+from app.utils.embeddings import get_embeddings
 
 router = APIRouter()
 
 
+def _merge(defaults: dict, values: dict) -> dict:
+    """
+    Merge nested settings: the unset fields, at any depth, take the default values.
+    """
+    merged = dict(defaults)
+    for key, value in values.items():
+        merged[key] = _merge(defaults=defaults[key], values=value) if isinstance(value, dict) and isinstance(defaults.get(key), dict) else value  # fmt: off
+
+    return merged
+
+
+@router.post("/collections")
+async def create_collection(
+    request: CollectionRequest, user: str = Security(check_api_key)
+) -> Collection:
+    """
+    Create a private collection, with an index profile: vectors quantization (scalar, binary or product), HNSW graph, on-disk vectors and payloads and search parameters. Unset fields of the profile take the server defaults.
+    """
+    if clients["models"][request.model].type != EMBEDDINGS_MODEL_TYPE:
+        raise HTTPException(status_code=400, detail=f"Model type must be {EMBEDDINGS_MODEL_TYPE}")
+    if await _get_collection(cache=clients["collections"], user=user, collection=request.name, errors="ignore"):  # fmt: off
+        raise HTTPException(status_code=400, detail="A collection already exists with the same name.")  # fmt: off
+
+    index = CONFIG.index if request.index is None else Index(**_merge(defaults=CONFIG.index.model_dump(), values=request.index.model_dump(exclude_unset=True)))  # fmt: off
+    collection = Collection(
+        id=str(uuid.uuid4()),
+        name=request.name,
+        type=PRIVATE_COLLECTION_TYPE,
+        model=request.model,
+        user=user,
+        description=request.description,
+        index=index,
+        manifest=True,
+        explicit=True,
+    )
+
+    # the dimension of the vectors is the one of the embeddings model
+    vectors, _ = await get_embeddings(model=request.model, inputs=[request.name])
+    await asyncio.to_thread(clients["files"].create_bucket, Bucket=collection.id)
+    await _create_collection(vectorstore=clients["vectors"], collection=collection, size=len(vectors[0]))  # fmt: off
+    await clients["collections"].invalidate(user=user)
+
+    return collection
+
+
 @router.get("/collections/{collection}")
 @router.get("/collections")
 async def get_collections(
@@ -24,12 +77,12 @@ async def get_collections(
     Get list of collections.
     """
     if collection is None:
-        collections = _get_collections(vectorstore=clients["vectors"], user=user)
+        collections = await _get_collections(cache=clients["collections"], user=user)
         LOGGER.debug(f"collections: {collections}")
         return collections
     else:
-        collection = _get_collection(
-            vectorstore=clients["vectors"], user=user, collection=collection
+        collection = await _get_collection(
+            cache=clients["collections"], user=user, collection=collection
         )
         LOGGER.debug(f"collection: {collection}")
         return collection
@@ -38,15 +91,24 @@ async def get_collections(
 @router.delete("/collections/{collection}")
 @router.delete("/collections")
 async def delete_collections(
-    collection: Optional[str] = None, user: str = Security(check_api_key)
+    background_tasks: BackgroundTasks,
+    collection: Optional[str] = None,
+    background: bool = False,
+    user: str = Security(check_api_key),
 ) -> Response:
     """
-    Get private collections and relative files.
+    Delete private collections and relative files. With background, the deletion is run as a job whose status is returned by the jobs endpoint.
     """
-    response = delete_contents(
-        s3=clients["files"],
-        vectorstore=clients["vectors"],
-        user=user,
-        collection=collection,
+    collections = await get_deletable_collections(
+        s3=clients["files"], cache=clients["collections"], user=user, collection=collection
     )
-    return response
+    kwargs = {"s3": clients["files"], "vectorstore": clients["vectors"], "cache": clients["collections"], "user": user, "collections": collections}  # fmt: off
+
+    if not background:
+        await delete_contents(**kwargs)
+        return Response(status_code=204)
+
+    job = await create_job(redis=clients["cache"], user=user)
+    background_tasks.add_task(run_job, redis=clients["cache"], job=job, user=user, coroutine=delete_contents(**kwargs))  # fmt: off
+
+    return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
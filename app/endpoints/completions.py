@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, Depends, Security, HTTPException, Response
 
 from app.schemas.completions import CompletionRequest, Completions
 from app.utils.lifespan import clients
-from app.utils.security import check_api_key
+from app.utils.security import check_api_key, get_priority
+from app.utils.upstream import forward_request, forward_stream
+from app.helpers import SSEFramer
+from app.schemas.config import LANGUAGE_MODEL_TYPE
 
 
 router = APIRouter()
@@ -10,7 +13,10 @@ router = APIRouter()
 
 @router.post("/completions")
 async def completions(
-    request: CompletionRequest, user: str = Security(check_api_key)
+    request: CompletionRequest,
+    response: Response,
+    user: str = Security(check_api_key),
+    priority: int = Depends(get_priority),
 ) -> Completions:
     """
     Completion API similar to OpenAI's API.
@@ -18,8 +24,39 @@ async def completions(
     """
 
     request = dict(request)
-
     client = clients["models"][request["model"]]
-    response = client.completions.create(**request)
+    if client.type != LANGUAGE_MODEL_TYPE:
+        raise HTTPException(status_code=400, detail="Model is not a language model")
+
+    limiter = clients["rate_limiter"]
+    headers = await limiter.check(user=user, model=request["model"], limits=client.rate_limits)
+    response.headers.update(headers)
+
+    # non stream case
+    if not request["stream"]:
+        data = await forward_request(client=client, endpoint="completions", request=request, priority=priority)  # fmt: off
+        clients["usage"].record(user=user, model=request["model"], usage=data.get("usage"))
+        await limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=(data.get("usage") or {}).get("total_tokens"))  # fmt: off
+        return Completions(**data)
+
+    # stream case
+    stream_id = await limiter.open_stream(user=user, model=request["model"], limits=client.rate_limits)  # fmt: off
+    on_usage = lambda usage: limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=usage.get("total_tokens"))  # fmt: off
+    prompt_tokens = clients["usage"].estimate_tokens(request["prompt"])
+    listener, close_usage = clients["usage"].recorder(user=user, model=request["model"], prompt_tokens=prompt_tokens, on_usage=on_usage)  # fmt: off
+
+    # usage is requested to the model API, the usage-only event is hidden if the client did not ask for it
+    hidden = None
+    if not (request["stream_options"] or {}).get("include_usage"):
+        request["stream_options"] = (request["stream_options"] or {}) | {"include_usage": True}
+        hidden = clients["usage"].is_usage_event
+    framer = SSEFramer(listeners=[listener], hidden=hidden)
+
+    async def on_close():
+        await close_usage()
+        await limiter.close_stream(user=user, model=request["model"], stream_id=stream_id)
+
+    response = await forward_stream(client=client, endpoint="completions", request=request, framer=framer, priority=priority, on_close=on_close)  # fmt: off
+    response.headers.update(headers)
 
     return response
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Security, HTTPException
+from fastapi import APIRouter, Depends, Security, HTTPException, Response
 
 from app.schemas.embeddings import EmbeddingsRequest, Embeddings
 from app.utils.lifespan import clients
-from app.utils.security import check_api_key
+from app.utils.security import check_api_key, get_priority
+from app.utils.upstream import forward_request
+from app.utils.embeddings import get_embeddings
 from app.schemas.config import EMBEDDINGS_MODEL_TYPE
 
 router = APIRouter()
@@ -10,7 +12,10 @@ router = APIRouter()
 
 @router.post("/embeddings")
 async def embeddings(
-    request: EmbeddingsRequest, user: str = Security(check_api_key)
+    request: EmbeddingsRequest,
+    response: Response,
+    user: str = Security(check_api_key),
+    priority: int = Depends(get_priority),
 ) -> Embeddings:
     """
     Embedding API similar to OpenAI's API.
@@ -21,6 +26,27 @@ async def embeddings(
     client = clients["models"][request["model"]]
     if client.type != EMBEDDINGS_MODEL_TYPE:
         raise HTTPException(status_code=400, detail=f"Model type must be {EMBEDDINGS_MODEL_TYPE}")
-    response = client.embeddings.create(**request)
 
-    return response
+    limiter = clients["rate_limiter"]
+    response.headers.update(await limiter.check(user=user, model=request["model"], limits=client.rate_limits))  # fmt: off
+
+    # only float embeddings of texts are coalesced with concurrent requests
+    inputs = [request["input"]] if isinstance(request["input"], str) else request["input"]
+    batchable = request["encoding_format"] == "float" and request["dimensions"] is None
+    if not batchable or not inputs or not all(isinstance(input, str) for input in inputs):
+        data = await forward_request(client=client, endpoint="embeddings", request=request, priority=priority)  # fmt: off
+        clients["usage"].record(user=user, model=request["model"], usage=data.get("usage"))
+        await limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=(data.get("usage") or {}).get("total_tokens"))  # fmt: off
+        return Embeddings(**data)
+
+    vectors, prompt_tokens = await get_embeddings(model=request["model"], inputs=inputs, priority=priority)  # fmt: off
+    clients["usage"].record(user=user, model=request["model"], usage={"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens})  # fmt: off
+    await limiter.consume(user=user, model=request["model"], limits=client.rate_limits, tokens=prompt_tokens)  # fmt: off
+    data = {
+        "object": "list",
+        "model": request["model"],
+        "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],  # fmt: off
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+    return Embeddings(**data)
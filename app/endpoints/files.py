@@ -1,30 +1,42 @@
+import asyncio
 import base64
+import time
 import uuid
 from typing import List, Optional, Union
 
-from fastapi import APIRouter, Response, Security, UploadFile, HTTPException
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from fastapi import APIRouter, BackgroundTasks, Response, Security, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
 from botocore.exceptions import ClientError
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client.http.models import Filter, FieldCondition, MatchAny, PointStruct
 
 from app.schemas.collections import Collection
 from app.schemas.files import File, Files, Upload, Uploads
 from app.schemas.config import (
-    METADATA_COLLECTION,
     PRIVATE_COLLECTION_TYPE,
     PUBLIC_COLLECTION_TYPE,
     EMBEDDINGS_MODEL_TYPE,
 )
-from app.utils.config import LOGGER
+from app.utils.config import CONFIG, LOGGER
+from app.utils.embeddings import get_embeddings
 from app.utils.security import check_api_key
-from app.utils.data import get_chunks, get_collection, delete_contents
+from app.utils.data import (
+    add_chunks,
+    add_files,
+    backfill_files,
+    create_collection,
+    delete_contents,
+    get_collection,
+    get_deletable_collections,
+    get_files,
+)
+from app.utils.jobs import create_job, run_job
 from app.utils.lifespan import clients
 from app.helpers import S3FileLoader
 
 
 router = APIRouter()
 
+EMBEDDINGS_BATCH_SIZE = 32  # inputs per embeddings request (default max client batch size of TEI)
+
 
 @router.post("/files")
 async def upload_files(
@@ -62,8 +74,8 @@ async def upload_files(
         raise HTTPException(status_code=400, detail=f"Model type must be {EMBEDDINGS_MODEL_TYPE}")
 
     collection_name = collection
-    collection = get_collection(
-        vectorstore=clients["vectors"], user=user, collection=collection, errors="ignore"
+    collection = await get_collection(
+        cache=clients["collections"], user=user, collection=collection, errors="ignore"
     )
     if collection and collection.type == PUBLIC_COLLECTION_TYPE:
         raise HTTPException(status_code=400, detail="A public collection already exists with the same name")  # fmt: off
@@ -73,6 +85,8 @@ async def upload_files(
     # upload
     data = list()
     collection_id = collection.id if collection else str(uuid.uuid4())
+    if collection:  # the previous files of the collection must be in its manifest before adding new ones
+        await backfill_files(s3=clients["files"], vectorstore=clients["vectors"], cache=clients["collections"], collection=collection)  # fmt: off
 
     loader = S3FileLoader(
         s3=clients["files"],
@@ -81,11 +95,6 @@ async def upload_files(
         chunk_min_size=chunk_min_size,
     )
 
-    embedding = HuggingFaceEndpointEmbeddings(
-        model=str(clients["models"][embeddings_model].base_url).removesuffix("v1/"),
-        huggingfacehub_api_token=clients["models"][embeddings_model].api_key,
-    )
-
     try:
         clients["files"].head_bucket(Bucket=collection_id)
     except ClientError:
@@ -127,39 +136,44 @@ async def upload_files(
             continue
 
         try:
-            # create vectors from documents
-            db = await QdrantVectorStore.afrom_documents(
-                documents=documents,
-                embedding=embedding,
-                collection_name=collection_id,
-                url=clients["vectors"].url,
-                api_key=clients["vectors"].api_key,
-            )
+            # chunks are embedded through the embeddings cache and batcher of the model
+            texts = [document.page_content for document in documents]
+            results = await asyncio.gather(*[get_embeddings(model=embeddings_model, inputs=texts[i : i + EMBEDDINGS_BATCH_SIZE]) for i in range(0, len(texts), EMBEDDINGS_BATCH_SIZE)])  # fmt: off
+            vectors = [vector for batch, _ in results for vector in batch]
+
+            if not collection:
+                # the dimension of the vectors is the one of the embeddings model
+                metadata = Collection(
+                    id=collection_id,
+                    name=collection_name,
+                    type=PRIVATE_COLLECTION_TYPE,
+                    model=embeddings_model,
+                    user=user,
+                    description=None,
+                    index=CONFIG.index,
+                    manifest=True,
+                )
+                await create_collection(vectorstore=clients["vectors"], collection=metadata, size=len(vectors[0]))  # fmt: off
+                await clients["collections"].invalidate(user=user)
+                collection = metadata
+
+            # store the chunks, with BM25 sparse vectors for hybrid search
+            chunk_ids = await add_chunks(vectorstore=clients["vectors"], collection=collection, documents=documents, vectors=vectors)  # fmt: off
         except Exception as e:
             LOGGER.error(f"create vectors of {file_name}:\n{e}")
             clients["files"].delete_object(Bucket=collection_id, Key=file_id)
             data.append(Upload(id=file_id, filename=file_name, status="failed"))
             continue
 
-        if not collection:
-            metadata = Collection(
-                id=collection_id,
-                name=collection_name,
-                type=PRIVATE_COLLECTION_TYPE,
-                model=embeddings_model,
-                user=user,
-                description=None,
-            )
-            clients["vectors"].upsert(
-                collection_name=METADATA_COLLECTION,
-                points=[
-                    PointStruct(
-                        id=collection_id,
-                        payload=dict(metadata),
-                        vector={},
-                    )
-                ],
-            )
+        uploaded = File(
+            id=file_id,
+            bytes=file.size or 0,
+            filename=file_name,
+            content_type=file.content_type,
+            chunk_ids=chunk_ids,
+            created_at=round(time.time()),
+        )
+        await add_files(vectorstore=clients["vectors"], collection=collection_id, files=[uploaded])
 
         data.append(Upload(id=file_id, filename=file_name, status="success"))
 
@@ -177,42 +191,20 @@ async def files(
     Get files from a collection. Only files from private collections are returned.
     """
 
-    collection = get_collection(
-        vectorstore=clients["vectors"],
+    collection = await get_collection(
+        cache=clients["collections"],
         collection=collection,
         user=user,
         type=PRIVATE_COLLECTION_TYPE,
     )
 
-    data = list()
-    objects = clients["files"].list_objects_v2(Bucket=collection.id).get("Contents", [])
-    objects = [object | clients["files"].head_object(Bucket=collection.id, Key=object["Key"])["Metadata"] for object in objects]  # fmt: off
-    file_ids = [object["Key"] for object in objects]
-    filter = Filter(must=[FieldCondition(key="metadata.file_id", match=MatchAny(any=file_ids))])
-    chunks = get_chunks(vectorstore=clients["vectors"], collection=collection.id, filter=filter)
-
-    for object in objects:
-        chunk_ids = list()
-        for chunk in chunks:
-            if chunk.metadata["file_id"] == object["Key"]:
-                chunk_ids.append(chunk.id)
-
-        object = File(
-            id=object["Key"],
-            object="file",
-            bytes=object["Size"],
-            filename=base64.b64decode(object["filename"].encode("ascii")).decode("utf-8"),
-            chunk_ids=chunk_ids,
-            created_at=round(object["LastModified"].timestamp()),
-        )
-        data.append(object)
-
-        if str(object.id) == file:
-            return object
-
+    data = await get_files(s3=clients["files"], vectorstore=clients["vectors"], cache=clients["collections"], collection=collection, file=file)  # fmt: off
     LOGGER.debug(f"{collection.name} files: {data}")
-    if file:  # if loop pass without return data
-        raise HTTPException(status_code=404, detail="File not found.")
+
+    if file:
+        if not data:
+            raise HTTPException(status_code=404, detail="File not found.")
+        return data[0]
 
     return Files(data=data)
 
@@ -220,18 +212,29 @@ async def files(
 @router.delete("/files/{collection}/{file}")
 @router.delete("/files/{collection}")
 async def delete_file(
-    collection: str, file: Optional[str] = None, user: str = Security(check_api_key)
+    background_tasks: BackgroundTasks,
+    collection: str,
+    file: Optional[str] = None,
+    background: bool = False,
+    user: str = Security(check_api_key),
 ) -> Response:
     """
-    Delete files and relative collections. Only files from private collections can be deleted.
+    Delete files and relative collections. Only files from private collections can be deleted. With background, the deletion is run as a job whose status is returned by the jobs endpoint.
     """
-
-    response = delete_contents(
+    collections = await get_deletable_collections(
         s3=clients["files"],
-        vectorstore=clients["vectors"],
+        cache=clients["collections"],
         user=user,
         collection=collection,
         file=file,
     )
+    kwargs = {"s3": clients["files"], "vectorstore": clients["vectors"], "cache": clients["collections"], "user": user, "collections": collections, "file": file}  # fmt: off
+
+    if not background:
+        await delete_contents(**kwargs)
+        return Response(status_code=204)
+
+    job = await create_job(redis=clients["cache"], user=user)
+    background_tasks.add_task(run_job, redis=clients["cache"], job=job, user=user, coroutine=delete_contents(**kwargs))  # fmt: off
 
-    return response
+    return JSONResponse(status_code=202, content=job.model_dump(mode="json"))
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Security
+
+from app.schemas.jobs import Job
+from app.utils.jobs import get_job as _get_job
+from app.utils.lifespan import clients
+from app.utils.security import check_api_key
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job}")
+async def get_job(job: str, user: str = Security(check_api_key)) -> Job:
+    """
+    Get the status of a background job (e.g. a deletion of collections or files). Jobs are kept for a day.
+    """
+    return await _get_job(redis=clients["cache"], user=user, job=job)
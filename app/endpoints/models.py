@@ -22,15 +22,8 @@ async def models(
     if model is not None:
         # support double encoding
         unquote_model = urllib.parse.unquote(urllib.parse.unquote(model))
-        client = clients["models"][unquote_model]
-        response = [row for row in client.models.list().data if row.id == unquote_model][0]
+        response = clients["registry"].get(unquote_model)
     else:
-        response = {"object": "list", "data": []}
-        for model_id, client in clients["models"].items():
-            for row in client.models.list().data:
-                row = dict(row)
-                row["type"] = client.type
-                response["data"].append(dict(row))
-        response = Models(**response)
+        response = Models(data=clients["registry"].list())
 
     return response
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Security
+
+from app.schemas.queues import Queue, Queues
+from app.utils.lifespan import clients
+from app.utils.security import check_api_key
+
+router = APIRouter()
+
+
+@router.get("/queues")
+async def queues(user: str = Security(check_api_key)) -> Queues:
+    """
+    Get the admission queues of the models replicas: requests in flight, queue depth, rejected requests and average wait and service times (in seconds).
+    """
+    data = list()
+    for model, replicas in clients["models"].items():
+        for i, client in enumerate(replicas):
+            stats = client.admission.stats() if client.admission else {}
+            data.append(Queue(model=model, replica=i, inflight=client.inflight, **stats))
+
+    return Queues(data=data)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, Security
+
+from app.schemas.config import RERANK_MODEL_TYPE
+from app.schemas.rerank import Rerank, RerankRequest, Reranks
+from app.utils.lifespan import clients
+from app.utils.rerank import get_rerank
+from app.utils.security import check_api_key, get_priority
+
+router = APIRouter()
+
+
+@router.post("/rerank")
+async def rerank(
+    request: RerankRequest,
+    response: Response,
+    user: str = Security(check_api_key),
+    priority: int = Depends(get_priority),
+) -> Reranks:
+    """
+    Score the relevance of each input to the prompt with a reranking model. Scores are returned in the order of the inputs.
+    """
+    client = clients["models"][request.model]
+    if client.type != RERANK_MODEL_TYPE:
+        raise HTTPException(status_code=400, detail=f"Model type must be {RERANK_MODEL_TYPE}")
+
+    response.headers.update(await clients["rate_limiter"].check(user=user, model=request.model, limits=client.rate_limits))  # fmt: off
+    scores = await get_rerank(model=request.model, prompt=request.prompt, inputs=request.input, priority=priority)  # fmt: off
+    clients["usage"].record(user=user, model=request.model)
+
+    return Reranks(data=[Rerank(score=score, index=index) for index, score in enumerate(scores)])
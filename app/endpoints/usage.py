@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Query, Security
+
+from app.schemas.usage import Usage, Usages
+from app.utils.lifespan import clients
+from app.utils.security import check_api_key
+
+router = APIRouter()
+
+
+@router.get("/usage")
+async def usage(
+    days: int = Query(default=7, ge=1, le=90), user: str = Security(check_api_key)
+) -> Usages:
+    """
+    Get the usage of the API key per day and per model over the last days: requests, prompt, completion and total tokens. Usage is aggregated by each worker and can take a few seconds to show up.
+    """
+    data = await clients["usage"].get(user=user, days=days)
+
+    return Usages(data=[Usage(**row) for row in data])
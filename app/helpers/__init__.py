@@ -2,3 +2,13 @@ from ._s3fileloader import S3FileLoader
 from ._textcleaner import TextCleaner
 from ._universalparser import UniversalParser
 from ._gristkeymanager import GristKeyManager
+from ._sseframer import SSEFramer
+from ._embeddingsbatcher import EmbeddingsBatcher
+from ._embeddingscache import EmbeddingsCache
+from ._modelregistry import ModelRegistry
+from ._admissioncontroller import AdmissionController
+from ._responsecache import ResponseCache
+from ._ratelimiter import RateLimiter
+from ._usagemeter import UsageMeter
+from ._collectionscache import CollectionsCache
+from ._bm25encoder import BM25Encoder
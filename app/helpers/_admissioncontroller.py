@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from fastapi import HTTPException
+
+
+class AdmissionController:
+    """
+    Bound the number of concurrent requests sent to a model API, with a bounded wait queue.
+
+    Waiting requests are admitted by priority (lowest value first), then in arrival order. When
+    the queue is full or the wait is too long, requests are rejected with a 429 error and a
+    Retry-After estimation.
+
+    Args:
+        max_concurrency (int): Maximum number of concurrent requests.
+        max_queue (int): Maximum number of waiting requests.
+        queue_timeout (float): Maximum time (in seconds) a request can wait.
+    """
+
+    SMOOTHING = 0.1  # weight of the last measure in moving averages
+
+    def __init__(self, max_concurrency: int, max_queue: int = 100, queue_timeout: float = 30):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters = list()
+        self.counter = itertools.count()
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.service_time = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self.waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """
+        Estimate the time (in seconds) before a new request could be admitted.
+        """
+        return max(1, math.ceil((self.queued + 1) * self.service_time / self.max_concurrency))
+
+    def _reject(self, detail: str):
+        self.rejected += 1
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after())})  # fmt: off
+
+    async def acquire(self, priority: int = 0) -> float:
+        """
+        Wait for a slot.
+
+        Args:
+            priority (int): Request priority, lower values are admitted first.
+
+        Returns:
+            float: Admission time, to pass to release.
+        """
+        start = time.monotonic()
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return start
+
+        if self.queued >= self.max_queue:
+            self._reject(detail="Too many requests for this model, queue is full.")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+        try:
+            # unlike wait_for, wait does not swallow a cancellation once the slot is handed over
+            await asyncio.wait([future], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._wake()  # the slot was handed over to a cancelled request
+            future.cancel()
+            raise
+        if not future.done():
+            future.cancel()
+            self._reject(detail="Too many requests for this model, queue timeout.")
+
+        now = time.monotonic()
+        self.wait_time += self.SMOOTHING * (now - start - self.wait_time)
+        return now
+
+    def release(self, admitted_at: float):
+        """
+        Release a slot and hand it over to the next waiting request.
+
+        Args:
+            admitted_at (float): Admission time returned by acquire.
+        """
+        self.service_time += self.SMOOTHING * (time.monotonic() - admitted_at - self.service_time)
+        self._wake()
+
+    def _wake(self):
+        while self.waiters:
+            *_, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)  # the slot is transferred, active count is unchanged
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "wait_time": round(self.wait_time, 3),
+            "service_time": round(self.service_time, 3),
+        }
@@ -0,0 +1,60 @@
+from collections import Counter
+import re
+from typing import Dict, List
+import unicodedata
+import zlib
+
+from langchain_qdrant.sparse_embeddings import SparseEmbeddings, SparseVector
+
+
+class BM25Encoder(SparseEmbeddings):
+    """
+    Local BM25 sparse embeddings, without model nor corpus statistics: tokens are hashed to the
+    indices of the sparse vectors and documents values are the BM25 term frequencies. The inverse
+    document frequencies are computed by Qdrant at search time (IDF modifier of the sparse vectors).
+
+    Tokens are lowercased words without accents, so "Règlement" matches "reglement". Numbers are kept,
+    e.g. for article numbers, and the most frequent French stop words are removed.
+
+    Args:
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+        avgdl (float): Average number of tokens of a document (chunk), used for length normalization.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+    STOP_WORDS = set("a au aux avec ce ces d dans de des du elle en est et il l la le les leur lui n ne ni ou par pas pour qu que qui s sa se ses son sont sur un une".split())  # fmt: off
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avgdl: float = 100):
+        self.k1 = k1
+        self.b = b
+        self.avgdl = avgdl
+
+    def tokenize(self, text: str) -> List[str]:
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+
+        return [token for token in self.TOKEN_PATTERN.findall(text) if token not in self.STOP_WORDS]
+
+    @staticmethod
+    def _index(token: str) -> int:
+        return zlib.crc32(token.encode("utf-8"))
+
+    def _vector(self, values: Dict[int, float]) -> SparseVector:
+        indices = sorted(values)
+        return SparseVector(indices=indices, values=[values[index] for index in indices])
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        vectors = list()
+        for text in texts:
+            tokens = self.tokenize(text)
+            norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avgdl)
+            values = Counter()
+            for token, tf in Counter(tokens).items():
+                values[self._index(token)] += tf * (self.k1 + 1) / (tf + norm)  # hash collisions are summed
+            vectors.append(self._vector(values))
+
+        return vectors
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self._vector({self._index(token): 1.0 for token in self.tokenize(text)})
@@ -0,0 +1,139 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Dict, Optional
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import FieldCondition, Filter, MatchAny
+from redis.asyncio import Redis
+
+from app.schemas.collections import Collection
+from app.schemas.config import METADATA_COLLECTION, PUBLIC_COLLECTION_TYPE
+from app.utils.config import LOGGER
+
+
+class CollectionsCache:
+    """
+    Cache of the collections metadata visible by each user (its private collections and the public
+    collections), indexed by collection name.
+
+    Entries expire after a short TTL and are invalidated on writes. Invalidations are broadcast to
+    the other workers with Redis pub/sub.
+
+    Args:
+        vectorstore (AsyncQdrantClient): The vectorstore with the collections metadata.
+        redis (Redis): Redis client.
+        ttl (int): Time to live (in seconds) of the collections of a user.
+        maxsize (int): Maximum number of users kept in memory.
+    """
+
+    CHANNEL = "collections-invalidation"
+    ALL = "*"
+
+    def __init__(self, vectorstore: AsyncQdrantClient, redis: Redis, ttl: int = 30, maxsize: int = 10000):  # fmt: off
+        self.vectorstore = vectorstore
+        self.redis = redis
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.users = OrderedDict()  # user -> (expiration, {name: collection})
+        self.loading = dict()  # user -> running load
+        self.invalidations = 0
+        self.task = None
+
+    async def _load(self, user: str) -> Dict[str, Collection]:
+        filter = Filter(
+            should=[
+                FieldCondition(key="user", match=MatchAny(any=[user])),
+                FieldCondition(key="type", match=MatchAny(any=[PUBLIC_COLLECTION_TYPE])),
+            ]
+        )
+        collections, offset = dict(), None
+        while True:
+            points, offset = await self.vectorstore.scroll(collection_name=METADATA_COLLECTION, scroll_filter=filter, limit=1000, offset=offset)  # fmt: off
+            for point in points:
+                collection = Collection(**point.payload)
+                # a private collection takes precedence over a public collection with the same name
+                if collection.name not in collections or collection.user == user:
+                    collections[collection.name] = collection
+            if offset is None:
+                return collections
+
+    async def get(self, user: str) -> Dict[str, Collection]:
+        """
+        Get the collections visible by a user. Concurrent loads of the collections of a user are
+        merged into one.
+
+        Args:
+            user (str): The user ID.
+
+        Returns:
+            Dict[str, Collection]: The collections metadata by name.
+        """
+        entry = self.users.get(user)
+        if entry and entry[0] > time.monotonic():
+            self.users.move_to_end(user)
+            return entry[1]
+
+        invalidations = self.invalidations
+        if user not in self.loading:
+            self.loading[user] = asyncio.create_task(self._load(user=user))
+            self.loading[user].add_done_callback(lambda task: self.loading.get(user) is task and self.loading.pop(user))  # fmt: off
+        collections = await asyncio.shield(self.loading[user])
+        if invalidations != self.invalidations:  # the loaded collections may be outdated
+            return collections
+
+        self.users[user] = (time.monotonic() + self.ttl, collections)
+        self.users.move_to_end(user)
+        while len(self.users) > self.maxsize:
+            self.users.popitem(last=False)
+        LOGGER.debug(f"collections of {user} loaded: {list(collections)}")
+
+        return collections
+
+    def _drop(self, user: str):
+        self.invalidations += 1
+        if user == self.ALL:
+            self.users.clear()
+            self.loading.clear()
+        else:
+            self.users.pop(user, None)
+            self.loading.pop(user, None)
+
+    async def invalidate(self, user: Optional[str] = None):
+        """
+        Invalidate the collections of a user in all workers.
+
+        Args:
+            user (Optional[str]): The user ID. Defaults to None (all users, e.g. after a public collection change).
+        """
+        user = user or self.ALL
+        self._drop(user=user)
+        try:
+            await self.redis.publish(self.CHANNEL, user)
+        except Exception as e:
+            LOGGER.warning(
+                f"collections invalidation not broadcast, other workers rely on TTL: {e}"
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    self.users.clear()  # invalidations may have been missed before subscription
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._drop(user=message["data"].decode("utf-8"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.warning(f"collections invalidation channel lost: {e}")
+                await asyncio.sleep(1)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,162 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from fastapi import HTTPException
+import httpx
+
+from app.utils import upstream
+from app.utils.config import LOGGER
+
+
+@dataclass
+class _Item:
+    inputs: List[str]
+    tokens: int
+    future: asyncio.Future = field(repr=False)
+
+
+class EmbeddingsBatcher:
+    """
+    Coalesce concurrent embeddings requests of a model into batched upstream calls.
+
+    Inputs submitted within a short window are sent in a single call to the embeddings API,
+    results are scattered back to each caller in order.
+
+    Args:
+        client: The model client (see lifespan).
+        model (str): The model ID.
+        max_batch_size (int): Maximum number of inputs per upstream call.
+        max_batch_tokens (int): Maximum number of (estimated) tokens per upstream call.
+        max_wait (float): Maximum time (in seconds) to wait for other requests before sending a batch.
+    """
+
+    CHARS_PER_TOKEN = 4  # rough token estimation, the exact count is only known by the upstream
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 16384,
+        max_wait: float = 0.005,
+    ):
+        self.client = client
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.pending = None
+        self.task = None
+        self.tasks = set()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, *self.tasks, return_exceptions=True)
+
+    async def embed(self, inputs: List[str]) -> Tuple[List[List[float]], int]:
+        """
+        Embed a list of texts.
+
+        Args:
+            inputs (List[str]): Texts to embed.
+
+        Returns:
+            Tuple[List[List[float]], int]: Embeddings in the order of the inputs and the number of prompt tokens.
+        """
+        tokens = sum(len(input) // self.CHARS_PER_TOKEN + 1 for input in inputs)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_Item(inputs=inputs, tokens=tokens, future=future))
+
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = self.pending or await self.queue.get()
+            self.pending = None
+            batch, size, tokens = [item], len(item.inputs), item.tokens
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size and tokens < self.max_batch_tokens:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if size + len(item.inputs) > self.max_batch_size or tokens + item.tokens > self.max_batch_tokens:  # fmt: off
+                    self.pending = item
+                    break
+                batch.append(item)
+                size += len(item.inputs)
+                tokens += item.tokens
+
+            # send without blocking the collection of the next batch
+            task = asyncio.create_task(self._send(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _request(self, inputs: List[str]) -> dict:
+        try:
+            response = await self.client.async_client.post(
+                url=f"{self.client.base_url}embeddings", json={"model": self.model, "input": inputs}
+            )
+        except httpx.TransportError as e:
+            raise upstream.upstream_error(e)
+        if response.is_error:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+
+        return response.json()
+
+    async def _send(self, batch: List[_Item]):
+        # the futures of the batch are always resolved, callers would wait forever otherwise
+        try:
+            await self._scatter(batch)
+        except Exception as e:
+            LOGGER.warning(f"embeddings batch of {len(batch)} requests failed: {e}")
+            if not isinstance(e, HTTPException):  # e.g. malformed response
+                e = HTTPException(status_code=502, detail=f"Invalid response of the model API: {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        except BaseException:  # cancelled, e.g. on shutdown
+            for item in batch:
+                item.future.cancel()
+            raise
+
+    async def _scatter(self, batch: List[_Item]):
+        inputs = [input for item in batch for input in item.inputs]
+        try:
+            data = await self._request(inputs=inputs)
+        except HTTPException as e:
+            # an invalid input should not fail the other requests of the batch
+            if len(batch) > 1 and 400 <= e.status_code < 500:
+                LOGGER.debug(f"embeddings batch of {len(batch)} requests failed, retrying separately: {e}")  # fmt: off
+                await asyncio.gather(*[self._send([item]) for item in batch])
+                return
+            raise
+
+        vectors = [row["embedding"] for row in sorted(data["data"], key=lambda row: row["index"])]
+        if len(vectors) != len(inputs):
+            raise HTTPException(status_code=502, detail=f"Model API returned {len(vectors)} embeddings for {len(inputs)} inputs.")  # fmt: off
+        prompt_tokens = (data.get("usage") or {}).get("prompt_tokens", 0)
+        total_tokens = sum(item.tokens for item in batch)
+
+        offset = 0
+        for item in batch:
+            if not item.future.done():
+                # upstream usage is shared between callers prorata of their estimated tokens
+                tokens = round(prompt_tokens * item.tokens / total_tokens)
+                item.future.set_result((vectors[offset : offset + len(item.inputs)], tokens))
+            offset += len(item.inputs)
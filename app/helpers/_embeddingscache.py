@@ -0,0 +1,105 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+import time
+from typing import List, Optional
+import unicodedata
+
+from redis.asyncio import Redis
+
+
+class EmbeddingsCache:
+    """
+    Two-tier embeddings cache: a bounded in-process LRU in front of Redis.
+
+    Vectors are content-addressed by model ID and hash of the normalized text, and stored in
+    Redis as float32 bytes.
+
+    Args:
+        redis (Redis): Redis client.
+        maxsize (int): Maximum number of vectors kept in process memory.
+        ttl (int): Time to live (in seconds) of vectors in memory and in Redis.
+    """
+
+    PREFIX = "embeddings"
+
+    def __init__(self, redis: Redis, maxsize: int = 10000, ttl: int = 86400):
+        self.redis = redis
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lru = OrderedDict()
+        self.hits = {"memory": 0, "redis": 0}
+        self.misses = 0
+
+    def _key(self, model: str, text: str) -> str:
+        text = unicodedata.normalize("NFC", text).strip()
+        return f"{self.PREFIX}:{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, key: str, vector: List[float]):
+        self.lru[key] = (vector, time.monotonic() + self.ttl)
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.maxsize:
+            self.lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = sum(self.hits.values()) + self.misses
+        return {
+            "size": len(self.lru),
+            "maxsize": self.maxsize,
+            "memory_hits": self.hits["memory"],
+            "redis_hits": self.hits["redis"],
+            "misses": self.misses,
+            "hit_rate": round(sum(self.hits.values()) / lookups, 3) if lookups else 0.0,
+        }
+
+    async def get(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Get cached vectors of texts.
+
+        Args:
+            model (str): The embeddings model ID.
+            texts (List[str]): Texts to look up.
+
+        Returns:
+            List[Optional[List[float]]]: Vectors in the order of the texts, None for cache misses.
+        """
+        keys = [self._key(model=model, text=text) for text in texts]
+        vectors = [None] * len(keys)
+        missing = list()
+        now = time.monotonic()
+        for i, key in enumerate(keys):
+            entry = self.lru.get(key)
+            if entry and entry[1] > now:
+                self.lru.move_to_end(key)
+                vectors[i] = entry[0]
+                self.hits["memory"] += 1
+            else:
+                missing.append(i)
+
+        if missing:
+            values = await self.redis.mget([keys[i] for i in missing])
+            for i, value in zip(missing, values):
+                if value is None:
+                    self.misses += 1
+                    continue
+                vectors[i] = array("f", value).tolist()
+                self._remember(key=keys[i], vector=vectors[i])
+                self.hits["redis"] += 1
+
+        return vectors
+
+    async def set(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """
+        Store vectors of texts.
+
+        Args:
+            model (str): The embeddings model ID.
+            texts (List[str]): Texts.
+            vectors (List[List[float]]): Vectors in the order of the texts.
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for text, vector in zip(texts, vectors):
+            key = self._key(model=model, text=text)
+            self._remember(key=key, vector=vector)
+            pipeline.setex(key, self.ttl, array("f", vector).tobytes())
+        await pipeline.execute()
@@ -1,67 +1,169 @@
+import asyncio
 import datetime as dt
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+import uuid
 
 from grist_api import GristDocAPI
 from fastapi import HTTPException
-from redis import Redis
+from redis.asyncio import Redis
 
+from app.utils.config import LOGGER
+
+# KEYS: lock, ARGV: token of the worker, deletes the lock only if it is still held by the worker
+UNLOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
 
 class GristKeyManager(GristDocAPI):
-    CACHE_EXPIRATION = 3600  # 1h
+    """
+    API keys stored in a table of a Grist document.
+
+    Each worker keeps an in-memory snapshot of the SHA-256 hashes of the valid keys, so checking a
+    key is a dictionary lookup. The snapshot is refreshed in the background from Redis, shared by
+    all workers, and Redis from Grist by a single worker at a time. If Grist is slow or down, the
+    last good snapshot is served.
+
+    Args:
+        table_id (str): ID of the Grist table with the keys (KEY and EXPIRATION columns, and an optional
+            ROLE column: keys with the "batch" role are admitted after interactive keys).
+        redis (Redis): Redis client.
+        refresh_interval (int): Interval (in seconds) between two refreshes of the keys from Grist.
+    """
+
+    LOCK_EXPIRATION = 60  # maximum time of a Grist refresh
 
-    def __init__(self, table_id: str, redis: Redis, *args, **kwargs):
+    def __init__(self, table_id: str, redis: Redis, *args, refresh_interval: int = 300, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = kwargs.get("user")
         self.doc_id = kwargs.get("doc_id")
         self.table_id = table_id
         self.redis = redis
+        self.refresh_interval = refresh_interval
+        # versioned, the previous releases store the keys in another format under auth-{doc_id}-{table_id}
+        self.key = f"auth-v2-{self.doc_id}-{self.table_id}"
+        self.keys = None  # key hash -> expiration timestamp (None for keys without expiration)
+        self.batch_keys = set()  # hashes of the keys with the batch role
+        self.lock = asyncio.Lock()
+        self.unlock_script = redis.register_script(UNLOCK_SCRIPT)
+        self.task = None
 
-    def check_api_key(self, key: str):
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def check_api_key(self, key: str) -> bool:
         """
         Check if a key exists in a table of the Grist document.
 
         Args:
             key (str): key to check
         """
-        keys = self._get_api_keys()
-        if key in keys:
-            return True
+        if self.keys is None:
+            raise HTTPException(status_code=503, detail="Authentication backend not available")
 
-        return False
+        hash = self._hash(key)
+        if hash not in self.keys:
+            return False
 
-    def cache(func):
-        """
-        Decorator to cache the result of a function in Redis.
-        """
+        expiration = self.keys[hash]
+        return expiration is None or expiration > time.time()
 
-        def wrapper(self):
-            key = f"auth-{self.doc_id}-{self.table_id}"
-            result = self.redis.get(key)
-            if result:
-                result = result.decode("utf-8").split(":")
-                return result
-            result = func(self)
-            self.redis.setex(key, self.CACHE_EXPIRATION, ":".join(result))
-
-            return result
+    def is_batch_key(self, key: str) -> bool:
+        """
+        Check if a key has the batch role.
 
-        return wrapper
+        Args:
+            key (str): key to check
+        """
+        return self._hash(key) in self.batch_keys
 
-    @cache
-    def _get_api_keys(self):
+    def _get_api_keys(self) -> Tuple[Dict[str, Optional[float]], List[str]]:
         """
-        Get all keys from a table in the Grist document.
+        Get all keys from a table in the Grist document, and the hashes of the keys with the batch role.
         """
         records = self.fetch_table(self.table_id)
 
-        keys = []
+        keys, batch_keys = dict(), list()
         for record in records:
+            if getattr(record, "ROLE", None) == "batch":  # optional column
+                batch_keys.append(self._hash(record.KEY))
             try:
                 if record.EXPIRATION:
                     if record.EXPIRATION > dt.datetime.now().timestamp():
-                        keys.append(record.KEY)
+                        keys[self._hash(record.KEY)] = record.EXPIRATION
                 else:
-                    keys.append(record.KEY)  # key without expiration
+                    keys[self._hash(record.KEY)] = None  # key without expiration
             except AttributeError:
                 raise HTTPException(status_code=500, detail="Invalid Grist table schema")
 
-        return keys
+        return keys, batch_keys
+
+    @staticmethod
+    def _decode(cached: Optional[bytes]) -> Optional[dict]:
+        """
+        Decode the keys stored in Redis, an invalid value is a cache miss.
+        """
+        if not cached:
+            return None
+        try:
+            cached = json.loads(cached)
+            return cached if isinstance(cached.get("keys"), dict) and isinstance(cached.get("fetched_at"), (int, float)) else None  # fmt: off
+        except (ValueError, AttributeError):
+            return None
+
+    async def refresh(self):
+        """
+        Refresh the keys snapshot. Keys are read from Redis and, if they are older than the refresh
+        interval, fetched from Grist by the worker holding the Redis lock. Concurrent refreshes of
+        a worker are merged into one.
+        """
+        if self.lock.locked():
+            async with self.lock:  # wait for the running refresh
+                return
+
+        async with self.lock:
+            try:
+                cached = self._decode(await self.redis.get(self.key))
+                if cached:
+                    self.keys, self.batch_keys = cached["keys"], set(cached.get("batch") or [])
+                    if cached["fetched_at"] + self.refresh_interval > time.time():
+                        return
+
+                # the lock can expire during a slow refresh and be taken by another worker, it is
+                # released only if it still holds the token of this refresh
+                token = uuid.uuid4().hex
+                locked = await self.redis.set(f"{self.key}-lock", token, nx=True, ex=self.LOCK_EXPIRATION)  # fmt: off
+                if not locked and self.keys is not None:
+                    return  # another worker is refreshing the keys
+
+                try:
+                    keys, batch_keys = await asyncio.to_thread(self._get_api_keys)
+                    if locked:
+                        # no expiration, the last good keys are served while Grist is down
+                        await self.redis.set(self.key, json.dumps({"fetched_at": time.time(), "keys": keys, "batch": batch_keys}))  # fmt: off
+                    self.keys, self.batch_keys = keys, set(batch_keys)
+                finally:
+                    if locked:
+                        await self.unlock_script(keys=[f"{self.key}-lock"], args=[token])
+            except Exception as e:
+                LOGGER.warning(f"error to refresh the API keys from Grist, last keys are kept: {e}")
+
+    async def _run(self):
+        while True:
+            # poll Redis more often than Grist, to pick up keys refreshed by other workers
+            await asyncio.sleep(min(self.refresh_interval, 60))
+            await self.refresh()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE, LANGUAGE_MODEL_TYPE, RERANK_MODEL_TYPE
+from app.schemas.models import Model
+from app.utils.config import LOGGER
+
+
+class ModelRegistry:
+    """
+    In-memory registry of the models metadata served by the model APIs.
+
+    Metadata are fetched concurrently from all model APIs and refreshed in the background, so
+    listing models never waits for an upstream. Models whose APIs are all unreachable are kept
+    with an "unavailable" status until one of them responds again. A model API unreachable at startup is
+    polled more often and its models are registered as soon as it responds.
+
+    Args:
+        on_register (Callable): Function called with the client and the model metadata when a model API serving a model is discovered.
+        refresh_interval (float): Interval (in seconds) between two refreshes of a reachable model API.
+        discovery_interval (float): Interval (in seconds) between two requests to an unreachable model API.
+        timeout (float): Timeout (in seconds) of a model API request.
+    """
+
+    def __init__(
+        self,
+        on_register: Callable,
+        refresh_interval: float = 60,
+        discovery_interval: float = 10,
+        timeout: float = 10,
+    ):
+        self.on_register = on_register
+        self.refresh_interval = refresh_interval
+        self.discovery_interval = discovery_interval
+        self.timeout = timeout
+        self.clients = list()
+        self.models = dict()
+        self.owners = dict()
+        self.reachable = dict()
+        self.next_refresh = dict()
+        self.fetching = dict()
+        self.task = None
+
+    def add(self, client):
+        """
+        Add a model API to the registry, its models are registered at the next refresh.
+
+        Args:
+            client: The model client (see lifespan).
+        """
+        self.clients.append(client)
+        self.next_refresh[id(client)] = 0
+        self.reachable[id(client)] = False
+
+    async def fetch(self, client) -> List[Model]:
+        """
+        Request the models metadata of a model API. Support embeddings and reranking API models deployed
+        with HuggingFace Text Embeddings Inference (see: https://github.com/huggingface/text-embeddings-inference).
+
+        Args:
+            client: The model client (see lifespan).
+
+        Returns:
+            List[Model]: The models served by the model API.
+        """
+        data = list()
+
+        if client.type == LANGUAGE_MODEL_TYPE:
+            endpoint = f"{client.base_url}models"
+            response = await client.async_client.get(url=endpoint, timeout=self.timeout)
+            response.raise_for_status()
+            for row in response.json()["data"]:
+                data.append(
+                    Model(
+                        id=row["id"],
+                        object="model",
+                        owned_by=row.get("owned_by", ""),
+                        created=row.get("created", round(time.time())),
+                        max_model_len=row.get("max_model_len", None),
+                        type=LANGUAGE_MODEL_TYPE,
+                    )
+                )
+
+        elif client.type in [EMBEDDINGS_MODEL_TYPE, RERANK_MODEL_TYPE]:
+            endpoint = str(client.base_url).replace("/v1/", "/info")
+            response = await client.async_client.get(url=endpoint, timeout=self.timeout)
+            response.raise_for_status()
+            response = response.json()
+            data.append(
+                Model(
+                    id=response["model_id"],
+                    object="model",
+                    owned_by="huggingface-text-embeddings-inference",
+                    max_model_len=response.get("max_input_length", None),
+                    created=round(time.time()),
+                    type=client.type,
+                )
+            )
+        else:
+            raise HTTPException(status_code=400, detail="Model type not supported.")
+
+        return data
+
+    async def _refresh_client(self, client):
+        try:
+            models = await self.fetch(client)
+        except Exception as e:
+            LOGGER.warning(f"error to request the model API on {client.base_url}: {e}")
+            self.next_refresh[id(client)] = time.monotonic() + self.discovery_interval
+            self.reachable[id(client)] = False
+        else:
+            self.next_refresh[id(client)] = time.monotonic() + self.refresh_interval
+            self.reachable[id(client)] = True
+            for model in models:
+                owners = self.owners.setdefault(model.id, set())
+                if id(client) not in owners:
+                    self.on_register(client, model)
+                    owners.add(id(client))
+                    LOGGER.info(f"model {model.id} registered from {client.base_url}")
+                previous = self.models.get(model.id)
+                if previous:  # keep the creation date of models without one upstream
+                    model.created = min(model.created, previous.created)
+                self.models[model.id] = model
+
+        # a model is available as long as one of its replicas is reachable
+        for model_id, owners in self.owners.items():
+            if id(client) in owners:
+                status = "available" if any(self.reachable[owner] for owner in owners) else "unavailable"  # fmt: off
+                self.models[model_id] = self.models[model_id].model_copy(update={"status": status})
+
+    async def refresh(self, timeout: Optional[float] = None, force: bool = False):
+        """
+        Refresh concurrently the model APIs due for a refresh. Requests still running after the
+        timeout are not cancelled, their models are registered when they respond.
+
+        Args:
+            timeout (Optional[float]): Maximum time (in seconds) to wait for the model APIs. Defaults to None (no limit).
+            force (bool): Refresh all model APIs, even if not due for a refresh.
+        """
+        now = time.monotonic()
+        for client in self.clients:
+            if id(client) in self.fetching or (not force and self.next_refresh[id(client)] > now):
+                continue
+            task = asyncio.create_task(self._refresh_client(client))
+            self.fetching[id(client)] = task
+            task.add_done_callback(lambda task, key=id(client): self.fetching.pop(key, None))
+
+        if self.fetching:
+            await asyncio.wait(list(self.fetching.values()), timeout=timeout)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(min(self.refresh_interval, self.discovery_interval))
+            try:
+                await self.refresh()
+            except Exception as e:
+                LOGGER.error(f"models registry refresh failed: {e}")
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self.fetching.values()) + ([self.task] if self.task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get(self, model: str) -> Model:
+        try:
+            return self.models[model]
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Model not found.")
+
+    def list(self) -> List[Model]:
+        return list(self.models.values())
@@ -0,0 +1,181 @@
+import datetime as dt
+import time
+from typing import Optional
+import uuid
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+
+from app.schemas.config import RateLimits
+
+# KEYS: requests sliding window, tokens of the day
+# ARGV: now (ms), window (ms), max requests, request id, max tokens (-1 for no limit)
+# returns: status (1 admitted, 0 too many requests, -1 too many tokens), requests in the window,
+# time (ms) before the oldest request leaves the window, tokens of the day
+CHECK_SCRIPT = """
+local now, window = tonumber(ARGV[1]), tonumber(ARGV[2])
+local max_requests, max_tokens = tonumber(ARGV[3]), tonumber(ARGV[5])
+local tokens = tonumber(redis.call("GET", KEYS[2]) or "0")
+if max_tokens >= 0 and tokens >= max_tokens then
+    return {-1, 0, 0, tokens}
+end
+if max_requests < 0 then
+    return {1, 0, 0, tokens}
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - window)
+local count = redis.call("ZCARD", KEYS[1])
+if count >= max_requests then
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    return {0, count, tonumber(oldest[2]) + window - now, tokens}
+end
+redis.call("ZADD", KEYS[1], now, ARGV[4])
+redis.call("PEXPIRE", KEYS[1], window)
+local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+return {1, count + 1, tonumber(oldest[2]) + window - now, tokens}
+"""
+
+# KEYS: open streams
+# ARGV: now (ms), max stream duration (ms), max streams, stream id
+# returns: 1 if the stream is opened, 0 otherwise
+STREAM_SCRIPT = """
+local now, duration = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - duration)
+if redis.call("ZCARD", KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call("ZADD", KEYS[1], now, ARGV[4])
+redis.call("PEXPIRE", KEYS[1], duration)
+return 1
+"""
+
+
+class RateLimiter:
+    """
+    Rate limits per user and per model, shared by all workers through atomic Redis scripts:
+    requests per minute (sliding window), concurrent streams and tokens per day (UTC).
+
+    Tokens are counted once the response is known (see consume), so the request exceeding the daily
+    quota is served and the next ones are rejected.
+
+    Args:
+        redis (Redis): Redis client.
+    """
+
+    PREFIX = "ratelimit"
+    WINDOW = 60  # seconds of the requests window
+    MAX_STREAM_DURATION = 3600  # seconds after which a stream not closed (e.g. killed worker) is released
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.check_script = redis.register_script(CHECK_SCRIPT)
+        self.stream_script = redis.register_script(STREAM_SCRIPT)
+
+    def _tokens_key(self, user: str, model: str) -> str:
+        return f"{self.PREFIX}:tokens:{user}:{model}:{dt.datetime.now(dt.timezone.utc).strftime('%Y%m%d')}"
+
+    @staticmethod
+    def _reset_tokens() -> int:
+        now = dt.datetime.now(dt.timezone.utc)
+        tomorrow = (now + dt.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return int((tomorrow - now).total_seconds()) + 1
+
+    async def check(self, user: str, model: str, limits: RateLimits) -> dict:
+        """
+        Count a request of a user and check its requests and tokens limits.
+
+        Args:
+            user (str): The user ID.
+            model (str): The model ID.
+            limits (RateLimits): The rate limits of the model.
+
+        Returns:
+            dict: The rate limit headers.
+        """
+        if limits.requests_per_minute is None and limits.tokens_per_day is None:
+            return {}
+
+        window = self.WINDOW * 1000
+        status, count, reset, tokens = await self.check_script(
+            keys=[
+                f"{self.PREFIX}:requests:{user}:{model}",
+                self._tokens_key(user=user, model=model),
+            ],
+            args=[
+                int(time.time() * 1000),
+                window,
+                -1 if limits.requests_per_minute is None else limits.requests_per_minute,
+                uuid.uuid4().hex,
+                -1 if limits.tokens_per_day is None else limits.tokens_per_day,
+            ],
+        )
+
+        headers = dict()
+        if limits.requests_per_minute is not None:
+            headers["X-RateLimit-Limit-Requests"] = str(limits.requests_per_minute)
+            headers["X-RateLimit-Remaining-Requests"] = str(max(0, limits.requests_per_minute - count))  # fmt: off
+            headers["X-RateLimit-Reset-Requests"] = f"{max(0, reset) / 1000:.3f}s"
+        if limits.tokens_per_day is not None:
+            headers["X-RateLimit-Limit-Tokens"] = str(limits.tokens_per_day)
+            headers["X-RateLimit-Remaining-Tokens"] = str(max(0, limits.tokens_per_day - tokens))
+            headers["X-RateLimit-Reset-Tokens"] = f"{self._reset_tokens()}s"
+
+        if status == 0:
+            headers["Retry-After"] = str(max(1, -(-reset // 1000)))
+            raise HTTPException(status_code=429, detail="Rate limit exceeded: too many requests per minute for this model.", headers=headers)  # fmt: off
+        if status == -1:
+            headers["Retry-After"] = str(self._reset_tokens())
+            raise HTTPException(status_code=429, detail="Rate limit exceeded: too many tokens per day for this model.", headers=headers)  # fmt: off
+
+        return headers
+
+    async def open_stream(self, user: str, model: str, limits: RateLimits) -> Optional[str]:
+        """
+        Open a stream of a user and check its concurrent streams limit.
+
+        Args:
+            user (str): The user ID.
+            model (str): The model ID.
+            limits (RateLimits): The rate limits of the model.
+
+        Returns:
+            Optional[str]: The stream ID, to pass to close_stream, None if streams are not limited.
+        """
+        if limits.concurrent_streams is None:
+            return None
+
+        stream_id = uuid.uuid4().hex
+        opened = await self.stream_script(
+            keys=[f"{self.PREFIX}:streams:{user}:{model}"],
+            args=[int(time.time() * 1000), self.MAX_STREAM_DURATION * 1000, limits.concurrent_streams, stream_id],  # fmt: off
+        )
+        if not opened:
+            headers = {
+                "X-RateLimit-Limit-Streams": str(limits.concurrent_streams),
+                "Retry-After": "1",
+            }
+            raise HTTPException(status_code=429, detail="Rate limit exceeded: too many concurrent streams for this model.", headers=headers)  # fmt: off
+
+        return stream_id
+
+    async def close_stream(self, user: str, model: str, stream_id: Optional[str]):
+        if stream_id is not None:
+            await self.redis.zrem(f"{self.PREFIX}:streams:{user}:{model}", stream_id)
+
+    async def consume(self, user: str, model: str, limits: RateLimits, tokens: int):
+        """
+        Count the tokens of a response in the tokens of the day of a user.
+
+        Args:
+            user (str): The user ID.
+            model (str): The model ID.
+            limits (RateLimits): The rate limits of the model.
+            tokens (int): The number of tokens of the request and its response.
+        """
+        if limits.tokens_per_day is None or not tokens:
+            return
+
+        key = self._tokens_key(user=user, model=model)
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.incrby(key, tokens)
+        pipeline.expire(key, 2 * 86400)
+        await pipeline.execute()
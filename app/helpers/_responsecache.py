@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Callable, Optional
+
+from redis.asyncio import Redis
+
+from app.utils.config import LOGGER
+
+
+class ResponseCache:
+    """
+    Cache of deterministic chat completions (temperature 0 or fixed seed) in Redis.
+
+    Cached completions answer both non-streamed requests and streamed requests, replayed as
+    server-sent events.
+
+    Args:
+        redis (Redis): Redis client.
+        ttl (int): Time to live (in seconds) of the cached completions.
+        max_size (int): Maximum size (in bytes) of a cached completion, larger ones are not cached.
+    """
+
+    PREFIX = "chat-completions"
+    KEYS = ["model", "messages", "frequency_penalty", "max_tokens", "n", "presence_penalty", "temperature", "top_p", "seed", "stop", "tool_choice"]  # fmt: off
+
+    def __init__(self, redis: Redis, ttl: int = 3600, max_size: int = 1048576):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def key(self, request: dict, metadata: list) -> Optional[str]:
+        """
+        Get the cache key of a request, a canonical hash of the model, messages, sampling parameters
+        and tool outputs.
+
+        Args:
+            request (dict): The chat completion request, after tool calls.
+            metadata (list): The tool outputs.
+
+        Returns:
+            Optional[str]: The cache key, None if the request is not deterministic.
+        """
+        if request.get("temperature") != 0 and request.get("seed") is None:
+            return None
+
+        canonical = {key: request.get(key) for key in self.KEYS} | {"metadata": metadata}
+        canonical = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+        return f"{self.PREFIX}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        data = await self.redis.get(key)
+        return json.loads(data) if data else None
+
+    async def set(self, key: str, data: dict):
+        data = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.max_size:
+            return
+        await self.redis.setex(key, self.ttl, data)
+
+    def recorder(self, key: str, metadata: list) -> Callable:
+        """
+        Get a listener of a streamed completion (see SSEFramer) that caches the completion
+        rebuilt from the events once the stream is done.
+
+        Args:
+            key (str): The cache key.
+            metadata (list): The tool outputs, stored with the completion.
+
+        Returns:
+            Callable: The listener.
+        """
+        completion, contents = {"metadata": metadata, "choices": {}}, {}
+        cacheable = [True]
+
+        def listener(data: bytes):
+            if not cacheable[0]:
+                return
+            if data == b"[DONE]":
+                completion["object"] = "chat.completion"
+                completion["choices"] = [
+                    choice | {"message": {"role": "assistant", "content": "".join(contents[index])}}
+                    for index, choice in sorted(completion["choices"].items())
+                ]
+                task = asyncio.create_task(self.set(key=key, data=completion))
+                task.add_done_callback(lambda task: task.exception() and LOGGER.warning(f"cache chat completion: {task.exception()}"))  # fmt: off
+                return
+
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                return
+            completion.update({field: chunk[field] for field in ["id", "created", "model", "usage"] if chunk.get(field)})  # fmt: off
+            for choice in chunk.get("choices", []):
+                delta = choice.get("delta") or {}
+                if delta.get("tool_calls"):  # not replayable, do not cache
+                    cacheable[0] = False
+                    return
+                index = choice["index"]
+                contents.setdefault(index, []).append(delta.get("content") or "")
+                completion["choices"].setdefault(index, {"index": index, "finish_reason": None})
+                if choice.get("finish_reason"):
+                    completion["choices"][index]["finish_reason"] = choice["finish_reason"]
+
+        return listener
+
+    @staticmethod
+    async def replay(data: dict) -> AsyncIterator[bytes]:
+        """
+        Replay a cached completion as server-sent events of chat completion chunks.
+
+        Args:
+            data (dict): The cached completion.
+        """
+        chunk = {key: data.get(key) for key in ["id", "created", "model"]} | {"object": "chat.completion.chunk"}  # fmt: off
+        choices = [
+            {"index": choice["index"], "delta": {"role": "assistant", "content": choice["message"]["content"]}, "finish_reason": None}  # fmt: off
+            for choice in data["choices"]
+        ]
+        yield f"data: {json.dumps(chunk | {'choices': choices, 'metadata': data.get('metadata', [])})}\n\n".encode("utf-8")  # fmt: off
+
+        choices = [{"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]} for choice in data["choices"]]  # fmt: off
+        last = chunk | {"choices": choices}
+        if data.get("usage"):
+            last["usage"] = data["usage"]
+        yield f"data: {json.dumps(last)}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
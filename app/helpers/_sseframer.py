@@ -0,0 +1,127 @@
+import json
+from typing import Callable, List, Literal, Optional
+
+
+class SSEFramer:
+    """
+    Incremental Server-Sent Events framer for upstream streams.
+
+    Raw upstream reads are buffered and cut on event boundaries, so events split across several
+    reads are handled. Events are forwarded as bytes, only the first data event is touched to
+    inject the tool metadata.
+
+    Args:
+        metadata (Optional[list]): Metadata to inject in the stream. None to forward events untouched.
+        mode (str): "splice" (default) adds a "metadata" key to the first data event. "event" sends
+            metadata as a dedicated event before the first upstream event.
+        listeners (Optional[List[Callable]]): Functions called with the data of each upstream event
+            (as bytes, e.g. b"[DONE]"), before metadata injection.
+        hidden (Optional[Callable]): Function called with the data of each upstream event, after the
+            listeners, the event is not forwarded if it returns True.
+    """
+
+    SEPARATORS = (b"\r\n\r\n", b"\n\n")
+
+    def __init__(
+        self,
+        metadata: Optional[list] = None,
+        mode: Literal["splice", "event"] = "splice",
+        listeners: Optional[List[Callable]] = None,
+        hidden: Optional[Callable] = None,
+    ):
+        assert mode in ["splice", "event"], "mode must be 'splice' or 'event'"
+        self.mode = mode
+        self.listeners = listeners or []
+        self.hidden = hidden
+        self.metadata = json.dumps(metadata).encode("utf-8") if metadata is not None else None
+        self.buffer = bytearray()
+        self.injected = self.metadata is None
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add raw bytes read from the upstream and return the events completed by this read.
+
+        Args:
+            chunk (bytes): Raw bytes.
+
+        Returns:
+            List[bytes]: Complete events, separators included.
+        """
+        events = list()
+        if not self.injected and self.mode == "event":
+            events.append(self._metadata_event())
+            self.injected = True
+
+        start = max(len(self.buffer) - 3, 0)  # a separator can overlap the previous read
+        self.buffer += chunk
+        while True:
+            end, separator = self._find_separator(start)
+            if end == -1:
+                break
+            event = bytes(self.buffer[: end + len(separator)])
+            del self.buffer[: end + len(separator)]
+            start = 0
+            events.extend(self._process(event))
+
+        return events
+
+    def flush(self) -> List[bytes]:
+        """
+        Return the incomplete trailing event, if any, once the upstream stream is exhausted.
+        """
+        events = list()
+        if self.buffer:
+            event = bytes(self.buffer).rstrip(b"\r\n") + b"\n\n"
+            self.buffer.clear()
+            events.extend(self._process(event))
+        if not self.injected:
+            events.append(self._metadata_event())
+            self.injected = True
+
+        return events
+
+    def _find_separator(self, start: int):
+        found, found_separator = -1, None
+        for separator in self.SEPARATORS:
+            index = self.buffer.find(separator, start)
+            if index != -1 and (found == -1 or index < found):
+                found, found_separator = index, separator
+
+        return found, found_separator
+
+    def _metadata_event(self) -> bytes:
+        return b'data: {"metadata": ' + self.metadata + b"}\n\n"
+
+    @staticmethod
+    def _data(event: bytes) -> Optional[bytes]:
+        lines = [line[5:].removeprefix(b" ") for line in event.splitlines() if line.startswith(b"data:")]  # fmt: off
+        return b"\n".join(lines) if lines else None
+
+    def _process(self, event: bytes) -> List[bytes]:
+        if self.listeners or self.hidden:
+            data = self._data(event)
+            if data is not None:
+                for listener in self.listeners:
+                    listener(data)
+                if self.hidden and self.hidden(data):
+                    return []
+
+        if self.injected:
+            return [event]
+
+        index = event.find(b"data:")
+        if index == -1 or (index > 0 and event[index - 1 : index] not in b"\r\n"):
+            return [event]  # comment or field-only event, nothing to splice into
+
+        payload_start = index + 5
+        if event[payload_start : payload_start + 1] == b" ":
+            payload_start += 1
+        payload = event[payload_start:].lstrip()
+        self.injected = True
+
+        if not payload.startswith(b"{"):  # e.g. [DONE] as first event
+            return [self._metadata_event(), event]
+
+        offset = event.index(b"{", payload_start) + 1
+        separator = b"" if event[offset:].lstrip().startswith(b"}") else b", "
+        return [event[:offset] + b'"metadata": ' + self.metadata + separator + event[offset:]]
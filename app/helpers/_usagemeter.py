@@ -0,0 +1,187 @@
+import asyncio
+from collections import Counter
+import datetime as dt
+import json
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from app.utils.config import LOGGER
+
+
+class UsageMeter:
+    """
+    Usage accounting per user, per model and per day (UTC).
+
+    Usage is aggregated in process memory and flushed to Redis in batches (one hash per user and
+    per day), so counting the usage of a request costs no network call.
+
+    Args:
+        redis (Redis): Redis client.
+        flush_interval (float): Interval (in seconds) between two flushes to Redis.
+        retention (int): Number of days usage is kept in Redis.
+    """
+
+    PREFIX = "usage"
+    KINDS = ["requests", "prompt_tokens", "completion_tokens", "total_tokens"]
+
+    def __init__(self, redis: Redis, flush_interval: float = 10, retention: int = 90):
+        self.redis = redis
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.buffer = Counter()  # (user, model, day, kind) -> count
+        self.task = None
+
+    def record(self, user: str, model: str, usage: Optional[dict] = None):
+        """
+        Count a request and its tokens.
+
+        Args:
+            user (str): The user ID.
+            model (str): The model ID.
+            usage (Optional[dict]): The usage of the response (prompt_tokens, completion_tokens, total_tokens).
+        """
+        day = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%d")
+        self.buffer[(user, model, day, "requests")] += 1
+        for kind in self.KINDS[1:]:
+            if (usage or {}).get(kind):
+                self.buffer[(user, model, day, kind)] += usage[kind]
+
+    def recorder(self, user: str, model: str, prompt_tokens: int = 0, on_usage: Optional[Callable[[dict], Awaitable]] = None) -> Tuple[Callable, Callable[[], Awaitable]]:  # fmt: off
+        """
+        Get a listener of a streamed response (see SSEFramer) that reads the usage from the events,
+        and a coroutine function that counts it once the stream is closed, completed or not (e.g.
+        client disconnection, upstream error). If the model API did not report the usage, it is
+        estimated with the prompt tokens and the number of events (one token each).
+
+        Args:
+            user (str): The user ID.
+            model (str): The model ID.
+            prompt_tokens (int): Estimated number of prompt tokens, used if the usage is not reported.
+            on_usage (Optional[Callable[[dict], Awaitable]]): Coroutine function called with the usage once the stream is closed.
+
+        Returns:
+            Tuple[Callable, Callable[[], Awaitable]]: The listener and the coroutine function to call when the stream is closed.
+        """
+        usage, state = dict(), {"events": 0, "deltas": 0, "closed": False}
+
+        def listener(data: bytes):
+            # called for each token: only the events that report the usage are parsed
+            state["events"] += 1
+            if data == b"[DONE]":
+                return
+            if not self.has_usage(data):
+                state["deltas"] += 1
+                return
+            try:
+                usage.update(json.loads(data)["usage"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                return
+
+        async def close():
+            if state["closed"] or not state["events"]:  # closed twice, or the stream failed to open
+                return
+            state["closed"] = True
+            if not usage:
+                usage.update({"prompt_tokens": prompt_tokens, "completion_tokens": state["deltas"], "total_tokens": prompt_tokens + state["deltas"]})  # fmt: off
+            self.record(user=user, model=model, usage=usage)
+            if on_usage:
+                try:
+                    await on_usage(usage)
+                except Exception as e:
+                    LOGGER.warning(f"streamed usage: {e}")
+
+        return listener, close
+
+    @staticmethod
+    def has_usage(data: bytes) -> bool:
+        """
+        Check, without parsing it, if the data of an event reports the usage (the other events of a
+        stream with stream_options.include_usage have a null usage).
+        """
+        index = data.find(b'"usage"')
+        return index != -1 and data[index + 7 :].lstrip(b": ").startswith(b"{")
+
+    @classmethod
+    def is_usage_event(cls, data: bytes) -> bool:
+        """
+        Check if the data of an event is the usage-only chunk sent by the model API at the end of a
+        stream with stream_options.include_usage (no choices).
+        """
+        if not cls.has_usage(data):
+            return False
+        try:
+            return json.loads(data).get("choices") == []
+        except (json.JSONDecodeError, AttributeError):
+            return False
+
+    @staticmethod
+    def estimate_tokens(data) -> int:
+        """
+        Estimate the number of tokens of a prompt (about 4 characters per token).
+        """
+        return len(json.dumps(data, ensure_ascii=False)) // 4
+
+    async def flush(self):
+        """
+        Write the buffered usage to Redis in a single pipeline. Usage is kept in the buffer if Redis
+        is not reachable.
+        """
+        if not self.buffer:
+            return
+
+        buffer, self.buffer = self.buffer, Counter()
+        pipeline = self.redis.pipeline(transaction=False)
+        for (user, model, day, kind), count in buffer.items():
+            pipeline.hincrby(f"{self.PREFIX}:{user}:{day}", f"{model}:{kind}", count)
+        for user, day in {(user, day) for user, _, day, _ in buffer}:
+            pipeline.expire(f"{self.PREFIX}:{user}:{day}", self.retention * 86400)
+        try:
+            await pipeline.execute()
+        except Exception as e:
+            LOGGER.warning(f"usage flush failed: {e}")
+            self.buffer.update(buffer)
+
+    async def get(self, user: str, days: int) -> List[dict]:
+        """
+        Get the usage of a user per day and per model, flushed by all workers.
+
+        Args:
+            user (str): The user ID.
+            days (int): Number of days, up to today.
+
+        Returns:
+            List[dict]: The usage per day and per model.
+        """
+        today = dt.datetime.now(dt.timezone.utc).date()
+        dates = [(today - dt.timedelta(days=i)).strftime("%Y%m%d") for i in range(days)]
+        pipeline = self.redis.pipeline(transaction=False)
+        for day in dates:
+            pipeline.hgetall(f"{self.PREFIX}:{user}:{day}")
+
+        data = list()
+        for day, fields in zip(dates, await pipeline.execute()):
+            models = dict()
+            for field, count in fields.items():
+                model, kind = field.decode("utf-8").rsplit(":", 1)
+                models.setdefault(model, dict.fromkeys(self.KINDS, 0))[kind] = int(count)
+            for model, usage in sorted(models.items()):
+                data.append(
+                    {"date": dt.datetime.strptime(day, "%Y%m%d").date(), "model": model, **usage}
+                )
+
+        return data
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        await self.flush()
@@ -2,7 +2,21 @@ from fastapi import FastAPI, Security, Response
 
 from app.utils.lifespan import lifespan
 from app.utils.security import check_api_key
-from app.endpoints import chat, chunks, completions, collections, embeddings, files, models, tools
+from app.endpoints import (
+    caches,
+    chat,
+    chunks,
+    completions,
+    collections,
+    embeddings,
+    files,
+    jobs,
+    models,
+    queues,
+    rerank,
+    tools,
+    usage,
+)
 from app.utils.config import APP_CONTACT_URL, APP_CONTACT_EMAIL, APP_VERSION, APP_DESCRIPTION
 
 app = FastAPI(
@@ -28,7 +42,12 @@ app.include_router(models.router, tags=["Models"], prefix="/v1")
 app.include_router(chat.router, tags=["Chat"], prefix="/v1")
 app.include_router(completions.router, tags=["Completions"], prefix="/v1")
 app.include_router(embeddings.router, tags=["Embeddings"], prefix="/v1")
+app.include_router(rerank.router, tags=["Rerank"], prefix="/v1")
 app.include_router(collections.router, tags=["Collections"], prefix="/v1")
 app.include_router(chunks.router, tags=["Chunks"], prefix="/v1")
 app.include_router(files.router, tags=["Files"], prefix="/v1")
 app.include_router(tools.router, tags=["Tools"], prefix="/v1")
+app.include_router(queues.router, tags=["Monitoring"], prefix="/v1")
+app.include_router(caches.router, tags=["Monitoring"], prefix="/v1")
+app.include_router(usage.router, tags=["Monitoring"], prefix="/v1")
+app.include_router(jobs.router, tags=["Monitoring"], prefix="/v1")
@@ -0,0 +1,19 @@
+from typing import Literal, List
+
+from pydantic import BaseModel
+
+
+class Cache(BaseModel):
+    object: Literal["cache"] = "cache"
+    name: str
+    size: int
+    maxsize: int
+    memory_hits: int
+    redis_hits: int
+    misses: int
+    hit_rate: float
+
+
+class Caches(BaseModel):
+    object: Literal["list"] = "list"
+    data: List[Cache]
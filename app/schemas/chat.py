@@ -16,6 +16,7 @@ class ChatCompletionRequest(BaseModel):
     messages: List[ChatCompletionMessageParam]
     model: str
     stream: Optional[Literal[True, False]] = False
+    stream_options: Optional[Dict] = None
     frequency_penalty: Optional[float] = 0.0
     max_tokens: Optional[int] = None
     n: Optional[int] = 1
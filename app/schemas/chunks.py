@@ -1,4 +1,4 @@
-from typing import Literal, List
+from typing import Literal, List, Optional
 
 from pydantic import BaseModel
 
@@ -14,6 +14,8 @@ class Chunk(BaseModel):
 class Chunks(BaseModel):
     object: Literal["list"] = "list"
     data: List[Chunk]
+    has_more: bool = False
+    after: Optional[str] = None
 
 
 class ChunkRequest(BaseModel):
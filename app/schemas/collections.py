@@ -1,8 +1,8 @@
 from typing import Literal, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from app.schemas.config import PUBLIC_COLLECTION_TYPE, PRIVATE_COLLECTION_TYPE
+from app.schemas.config import PUBLIC_COLLECTION_TYPE, PRIVATE_COLLECTION_TYPE, Index
 
 class Collection(BaseModel):
     object: Literal["collection"] = "collection"
@@ -12,6 +12,18 @@ class Collection(BaseModel):
     model: str
     user: Optional[str] = None
     description: Optional[str] = None
+    index: Optional[Index] = None
+    # the files of the collection are listed in the file manifest (not for collections uploaded before manifests)
+    manifest: bool = Field(default=False, exclude=True)
+    # created with POST /collections, not deleted with its last file (collections created by uploads are)
+    explicit: bool = Field(default=False, exclude=True)
+
+
+class CollectionRequest(BaseModel):
+    name: str
+    model: str
+    description: Optional[str] = None
+    index: Optional[Index] = None
 
 
 class Collections(BaseModel):
@@ -1,11 +1,11 @@
-from typing import Optional, List, Union, Dict, Iterable
+from typing import Optional, List, Union, Dict
 
 from pydantic import BaseModel, Field
 from openai.types import Completion
 
 
 class CompletionRequest(BaseModel):
-    prompt: Union[str, List[str], Iterable[int], Iterable[Iterable[int]]]
+    prompt: Union[str, List[str], List[int], List[List[int]]]
     model: str
     best_of: Optional[int] = None
     echo: Optional[bool] = False
@@ -18,6 +18,7 @@ class CompletionRequest(BaseModel):
     seed: Optional[int] = None
     stop: Optional[Union[str, List[str]]] = Field(default_factory=list)
     stream: Optional[bool] = False
+    stream_options: Optional[Dict] = None
     suffix: Optional[str] = None
     temperature: Optional[float] = 1.0
     top_p: Optional[float] = 1.0
@@ -4,10 +4,14 @@ from pydantic import BaseModel, Field
 
 # Variables
 METADATA_COLLECTION = "collections"
+FILES_COLLECTION = "files"
 PUBLIC_COLLECTION_TYPE = "public"
 PRIVATE_COLLECTION_TYPE = "private"
 EMBEDDINGS_MODEL_TYPE = "text-embeddings-inference"
 LANGUAGE_MODEL_TYPE = "text-generation"
+RERANK_MODEL_TYPE = "text-reranking"
+INTERACTIVE_PRIORITY = 0
+BATCH_PRIORITY = 1
 
 
 class Key(BaseModel):
@@ -19,10 +23,67 @@ class Auth(BaseModel):
     args: dict
 
 
+class Pool(BaseModel):
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 60.0
+    http2: Optional[bool] = False
+
+
+class Batching(BaseModel):
+    max_batch_size: Optional[int] = 32
+    max_batch_tokens: Optional[int] = 16384
+    max_wait: Optional[float] = 0.005
+
+
+class Admission(BaseModel):
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = 100
+    queue_timeout: Optional[float] = 30
+
+
+class RateLimits(BaseModel):
+    requests_per_minute: Optional[int] = None
+    concurrent_streams: Optional[int] = None
+    tokens_per_day: Optional[int] = None
+
+
 class Model(BaseModel):
     url: str
-    type: Literal[LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE]
+    type: Literal[LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE, RERANK_MODEL_TYPE]
     key: Optional[str] = "EMPTY"
+    timeout: Optional[float] = 20.0
+    pool: Optional[Pool] = Field(default_factory=Pool)
+    batching: Optional[Batching] = Field(default_factory=Batching)
+    admission: Optional[Admission] = Field(default_factory=Admission)
+    rate_limits: Optional[RateLimits] = None
+
+
+class Quantization(BaseModel):
+    type: Literal["scalar", "binary", "product"] = "scalar"
+    always_ram: Optional[bool] = True
+    quantile: Optional[float] = None
+    compression: Optional[Literal["x4", "x8", "x16", "x32", "x64"]] = "x16"
+
+
+class HNSW(BaseModel):
+    m: Optional[int] = 16
+    ef_construct: Optional[int] = 100
+
+
+class IndexSearch(BaseModel):
+    hnsw_ef: Optional[int] = None
+    rescore: Optional[bool] = True
+    oversampling: Optional[float] = None
+
+
+class Index(BaseModel):
+    quantization: Optional[Quantization] = None
+    hnsw: Optional[HNSW] = Field(default_factory=HNSW)
+    on_disk: Optional[bool] = False
+    on_disk_payload: Optional[bool] = False
+    sparse: Optional[bool] = True
+    search: Optional[IndexSearch] = Field(default_factory=IndexSearch)
 
 
 class VectorDB(BaseModel):
@@ -46,7 +107,44 @@ class Databases(BaseModel):
     files: FilesDB
 
 
+class EmbeddingsCache(BaseModel):
+    maxsize: Optional[int] = 10000
+    ttl: Optional[int] = 86400
+
+
+class ModelsCache(BaseModel):
+    refresh_interval: Optional[float] = 60
+    discovery_interval: Optional[float] = 10
+    startup_timeout: Optional[float] = 10
+
+
+class ChatCompletionsCache(BaseModel):
+    enabled: Optional[bool] = False
+    ttl: Optional[int] = 3600
+    max_size: Optional[int] = 1048576
+
+
+class CollectionsCache(BaseModel):
+    ttl: Optional[int] = 30
+
+
+class Caches(BaseModel):
+    embeddings: Optional[EmbeddingsCache] = Field(default_factory=EmbeddingsCache)
+    models: Optional[ModelsCache] = Field(default_factory=ModelsCache)
+    chat_completions: Optional[ChatCompletionsCache] = Field(default_factory=ChatCompletionsCache)
+    collections: Optional[CollectionsCache] = Field(default_factory=CollectionsCache)
+
+
+class Metering(BaseModel):
+    flush_interval: Optional[float] = 10
+    retention: Optional[int] = 90
+
+
 class Config(BaseModel):
     auth: Optional[Auth] = None
     models: List[Model] = Field(..., min_length=1)
     databases: Databases
+    caches: Optional[Caches] = Field(default_factory=Caches)
+    rate_limits: Optional[RateLimits] = Field(default_factory=RateLimits)
+    metering: Optional[Metering] = Field(default_factory=Metering)
+    index: Optional[Index] = Field(default_factory=Index)
@@ -9,6 +9,7 @@ class File(BaseModel):
     id: UUID
     bytes: int
     filename: str
+    content_type: Optional[str] = None
     chunk_ids: Optional[list] = []
     created_at: int
 
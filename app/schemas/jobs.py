@@ -0,0 +1,12 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class Job(BaseModel):
+    object: Literal["job"] = "job"
+    id: str
+    status: Literal["pending", "running", "succeeded", "failed"] = "pending"
+    detail: Optional[str] = None
+    created_at: int
+    finished_at: Optional[int] = None
@@ -3,11 +3,12 @@ from typing import Literal, List
 from pydantic import BaseModel
 from openai.types import Model
 
-from app.schemas.config import LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE
+from app.schemas.config import LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE, RERANK_MODEL_TYPE
 
 
 class Model(Model):
-    type: Literal[LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE]
+    type: Literal[LANGUAGE_MODEL_TYPE, EMBEDDINGS_MODEL_TYPE, RERANK_MODEL_TYPE]
+    status: Literal["available", "unavailable"] = "available"
 
 
 class Models(BaseModel):
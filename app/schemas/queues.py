@@ -0,0 +1,22 @@
+from typing import Literal, List, Optional
+
+from pydantic import BaseModel
+
+
+class Queue(BaseModel):
+    object: Literal["queue"] = "queue"
+    model: str
+    replica: int
+    inflight: int
+    active: Optional[int] = None
+    queued: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = None
+    rejected: Optional[int] = None
+    wait_time: Optional[float] = None
+    service_time: Optional[float] = None
+
+
+class Queues(BaseModel):
+    object: Literal["list"] = "list"
+    data: List[Queue]
@@ -0,0 +1,20 @@
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+
+class RerankRequest(BaseModel):
+    prompt: str
+    input: List[str] = Field(..., min_length=1)
+    model: str
+
+
+class Rerank(BaseModel):
+    object: Literal["rerank"] = "rerank"
+    score: float
+    index: int
+
+
+class Reranks(BaseModel):
+    object: Literal["list"] = "list"
+    data: List[Rerank]
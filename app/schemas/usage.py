@@ -0,0 +1,19 @@
+import datetime as dt
+from typing import Literal, List
+
+from pydantic import BaseModel
+
+
+class Usage(BaseModel):
+    object: Literal["usage"] = "usage"
+    date: dt.date
+    model: str
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class Usages(BaseModel):
+    object: Literal["list"] = "list"
+    data: List[Usage]
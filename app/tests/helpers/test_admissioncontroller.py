@@ -0,0 +1,137 @@
+import asyncio
+
+from fastapi import HTTPException
+import pytest
+
+from app.helpers import AdmissionController
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestAdmissionController:
+    def test_priority_order(self):
+        """Test that waiting requests are admitted by priority, then in arrival order."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1)
+            admitted_at = await controller.acquire()
+            order = list()
+
+            async def request(name: str, priority: int):
+                admitted_at = await controller.acquire(priority=priority)
+                order.append(name)
+                controller.release(admitted_at)
+
+            tasks = list()
+            for name, priority in [("batch", 10), ("first", 0), ("second", 0), ("urgent", -1)]:
+                tasks.append(asyncio.create_task(request(name=name, priority=priority)))
+                await asyncio.sleep(0)
+            assert controller.queued == 4
+
+            controller.release(admitted_at)
+            await asyncio.gather(*tasks)
+            assert order == ["urgent", "first", "second", "batch"]
+            assert controller.active == 0 and controller.queued == 0
+
+        run(test())
+
+    def test_queue_full(self):
+        """Test the 429 error and its Retry-After header when the queue is full."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1, max_queue=1)
+            admitted_at = await controller.acquire()
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+
+            with pytest.raises(HTTPException) as error:
+                await controller.acquire()
+            assert error.value.status_code == 429
+            assert int(error.value.headers["Retry-After"]) >= 1
+            assert controller.stats()["rejected"] == 1
+
+            controller.release(admitted_at)
+            controller.release(await waiter)
+            assert controller.active == 0
+
+        run(test())
+
+    def test_queue_timeout(self):
+        """Test the 429 error of a request waiting longer than the queue timeout."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1, queue_timeout=0.05)
+            admitted_at = await controller.acquire()
+
+            with pytest.raises(HTTPException) as error:
+                await controller.acquire()
+            assert error.value.status_code == 429
+            assert controller.queued == 0
+
+            controller.release(admitted_at)
+            assert controller.active == 0
+
+        run(test())
+
+    def test_cancelled_waiter(self):
+        """Test that a waiter cancelled while queued is skipped by the next release."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1)
+            admitted_at = await controller.acquire()
+            cancelled = asyncio.create_task(controller.acquire(priority=-1))
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+            assert controller.queued == 1
+
+            controller.release(admitted_at)
+            controller.release(await waiter)
+            assert controller.active == 0 and controller.queued == 0
+
+        run(test())
+
+    def test_handover_to_cancelled_waiter(self):
+        """Test that a slot handed over to a waiter cancelled before it resumes goes to the next one."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1)
+            admitted_at = await controller.acquire()
+            cancelled = asyncio.create_task(controller.acquire(priority=-1))
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+
+            controller.release(admitted_at)  # the slot is handed over to the cancelled waiter
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            controller.release(await asyncio.wait_for(waiter, timeout=1))
+            assert controller.active == 0 and controller.queued == 0
+
+        run(test())
+
+    def test_handover_without_waiters(self):
+        """Test that a slot handed over to a cancelled waiter is freed when nobody else waits."""
+
+        async def test():
+            controller = AdmissionController(max_concurrency=1)
+            admitted_at = await controller.acquire()
+            cancelled = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+
+            controller.release(admitted_at)
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            assert controller.active == 0
+            controller.release(await controller.acquire())
+            assert controller.active == 0
+
+        run(test())
@@ -0,0 +1,61 @@
+import zlib
+
+import pytest
+
+from app.helpers import BM25Encoder
+
+
+class TestBM25Encoder:
+    def test_tokenize(self):
+        """Test that tokens are lowercased words without accents, stop words, nor punctuation."""
+        encoder = BM25Encoder()
+        tokens = encoder.tokenize("Le Règlement de l'Article L. 121-3, élaboré à Noël !")
+
+        assert tokens == ["reglement", "article", "121", "3", "elabore", "noel"]
+
+    def test_query_indices(self):
+        """Test that query tokens are hashed with crc32, in sorted indices, each with value 1."""
+        encoder = BM25Encoder()
+        vector = encoder.embed_query("Règlement règlement intérieur")
+
+        indices = sorted({zlib.crc32(b"reglement"), zlib.crc32(b"interieur")})
+        assert vector.indices == indices
+        assert vector.values == [1.0, 1.0]
+
+    def test_documents_match_queries(self):
+        """Test that a document and a query with the same word share its index."""
+        encoder = BM25Encoder()
+        document = encoder.embed_documents(["Le règlement du CSE"])[0]
+        query = encoder.embed_query("REGLEMENT")
+
+        assert set(query.indices) <= set(document.indices)
+
+    def test_term_frequencies(self):
+        """Test the BM25 term frequencies: saturated with the count, lower for longer documents."""
+        encoder = BM25Encoder(k1=1.2, b=0.75, avgdl=4)
+        index = zlib.crc32(b"recours")
+
+        def value(text: str) -> float:
+            vector = encoder.embed_documents([text])[0]
+            return vector.values[vector.indices.index(index)]
+
+        norm = 1.2 * (1 - 0.75 + 0.75 * 4 / 4)
+        assert value("recours gracieux contentieux hierarchique") == pytest.approx(2.2 / (1 + norm))
+        assert value("recours recours gracieux contentieux") == pytest.approx(2 * 2.2 / (2 + norm))
+        assert value("recours recours gracieux contentieux") < 2 * value("recours gracieux contentieux hierarchique")  # fmt: off
+        assert value("recours gracieux contentieux hierarchique tribunal delai") < value("recours gracieux contentieux hierarchique")  # fmt: off
+
+    def test_hash_collisions(self, monkeypatch):
+        """Test that the values of colliding tokens are summed."""
+        encoder = BM25Encoder(avgdl=2)
+        monkeypatch.setattr(encoder, "_index", lambda token: 7)
+        vector = encoder.embed_documents(["recours gracieux"])[0]
+
+        assert vector.indices == [7]
+        assert vector.values[0] == pytest.approx(2 * 2.2 / (1 + 1.2))
+
+    def test_empty(self):
+        """Test texts without tokens."""
+        encoder = BM25Encoder()
+        assert encoder.embed_query("le la les").indices == []
+        assert encoder.embed_documents([""])[0].values == []
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from fakeredis import FakeAsyncRedis
+from fastapi import HTTPException
+import pytest
+
+from app.helpers import RateLimiter
+from app.schemas.config import RateLimits
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestRateLimiter:
+    def test_no_limits(self):
+        """Test that nothing is counted without limits."""
+
+        async def test():
+            redis = FakeAsyncRedis()
+            limiter = RateLimiter(redis=redis)
+            assert await limiter.check(user="user", model="model", limits=RateLimits()) == {}
+            assert await limiter.open_stream(user="user", model="model", limits=RateLimits()) is None
+            await limiter.consume(user="user", model="model", limits=RateLimits(), tokens=10)
+            assert await redis.keys() == []
+
+        run(test())
+
+    def test_requests_per_minute(self):
+        """Test the requests sliding window, its headers and the Retry-After of a rejected request."""
+
+        async def test():
+            limiter = RateLimiter(redis=FakeAsyncRedis())
+            limits = RateLimits(requests_per_minute=2)
+
+            headers = await limiter.check(user="user", model="model", limits=limits)
+            assert headers["X-RateLimit-Limit-Requests"] == "2"
+            assert headers["X-RateLimit-Remaining-Requests"] == "1"
+            headers = await limiter.check(user="user", model="model", limits=limits)
+            assert headers["X-RateLimit-Remaining-Requests"] == "0"
+
+            with pytest.raises(HTTPException) as error:
+                await limiter.check(user="user", model="model", limits=limits)
+            assert error.value.status_code == 429
+            assert 1 <= int(error.value.headers["Retry-After"]) <= RateLimiter.WINDOW
+
+            # limits are per user and per model
+            await limiter.check(user="other", model="model", limits=limits)
+            await limiter.check(user="user", model="other", limits=limits)
+
+        run(test())
+
+    def test_requests_window_slides(self):
+        """Test that requests older than the window are not counted anymore."""
+
+        async def test():
+            limiter = RateLimiter(redis=FakeAsyncRedis())
+            limiter.WINDOW = 1
+            limits = RateLimits(requests_per_minute=1)
+
+            await limiter.check(user="user", model="model", limits=limits)
+            with pytest.raises(HTTPException):
+                await limiter.check(user="user", model="model", limits=limits)
+            await asyncio.sleep(1.1)
+            await limiter.check(user="user", model="model", limits=limits)
+
+        run(test())
+
+    def test_tokens_per_day(self):
+        """Test that the request exceeding the tokens of the day is served and the next ones rejected."""
+
+        async def test():
+            limiter = RateLimiter(redis=FakeAsyncRedis())
+            limits = RateLimits(tokens_per_day=100)
+
+            headers = await limiter.check(user="user", model="model", limits=limits)
+            assert headers["X-RateLimit-Remaining-Tokens"] == "100"
+            await limiter.consume(user="user", model="model", limits=limits, tokens=60)
+            headers = await limiter.check(user="user", model="model", limits=limits)
+            assert headers["X-RateLimit-Remaining-Tokens"] == "40"
+            await limiter.consume(user="user", model="model", limits=limits, tokens=60)
+
+            with pytest.raises(HTTPException) as error:
+                await limiter.check(user="user", model="model", limits=limits)
+            assert error.value.status_code == 429
+            assert error.value.headers["X-RateLimit-Remaining-Tokens"] == "0"
+            assert int(error.value.headers["Retry-After"]) <= 86401
+
+        run(test())
+
+    def test_tokens_checked_before_requests(self):
+        """Test that a request rejected for its tokens is not counted in the requests window."""
+
+        async def test():
+            limiter = RateLimiter(redis=FakeAsyncRedis())
+            limits = RateLimits(requests_per_minute=1, tokens_per_day=10)
+
+            await limiter.consume(user="user", model="model", limits=limits, tokens=10)
+            with pytest.raises(HTTPException) as error:
+                await limiter.check(user="user", model="model", limits=limits)
+            assert "tokens" in error.value.detail
+            assert await limiter.redis.zcard(f"{RateLimiter.PREFIX}:requests:user:model") == 0
+
+        run(test())
+
+    def test_concurrent_streams(self):
+        """Test the concurrent streams limit and the release of closed streams."""
+
+        async def test():
+            limiter = RateLimiter(redis=FakeAsyncRedis())
+            limits = RateLimits(concurrent_streams=2)
+
+            first = await limiter.open_stream(user="user", model="model", limits=limits)
+            await limiter.open_stream(user="user", model="model", limits=limits)
+            with pytest.raises(HTTPException) as error:
+                await limiter.open_stream(user="user", model="model", limits=limits)
+            assert error.value.status_code == 429
+            assert error.value.headers["X-RateLimit-Limit-Streams"] == "2"
+
+            await limiter.close_stream(user="user", model="model", stream_id=first)
+            await limiter.open_stream(user="user", model="model", limits=limits)
+            await limiter.close_stream(user="user", model="model", stream_id=None)
+
+        run(test())
+
+    def test_streams_not_closed_expire(self):
+        """Test that streams not closed (e.g. killed worker) are released after the maximum duration."""
+
+        async def test():
+            redis = FakeAsyncRedis()
+            limiter = RateLimiter(redis=redis)
+            limits = RateLimits(concurrent_streams=1)
+
+            key = f"{RateLimiter.PREFIX}:streams:user:model"
+            await redis.zadd(key, {"lost": int(time.time() * 1000) - RateLimiter.MAX_STREAM_DURATION * 1000 - 1})  # fmt: off
+            await limiter.open_stream(user="user", model="model", limits=limits)
+            assert await redis.zscore(key, "lost") is None
+
+        run(test())
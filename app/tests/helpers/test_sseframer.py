@@ -0,0 +1,70 @@
+import json
+
+from app.helpers import SSEFramer
+
+METADATA = [{"BaseRAG": {"prompt": "prompt", "metadata": {"chunks": ["id"]}}}]
+FIRST = b'data: {"id": "1", "choices": [{"delta": {"content": "hel"}}]}\n\n'
+SECOND = b'data: {"id": "1", "choices": [{"delta": {"content": "lo"}}]}\n\n'
+DONE = b"data: [DONE]\n\n"
+
+
+def data(event: bytes):
+    return json.loads(event.removeprefix(b"data: "))
+
+
+class TestSSEFramer:
+    def test_split_first_event(self):
+        """Test metadata injection in a first event split across several reads."""
+        framer = SSEFramer(metadata=METADATA)
+        stream = FIRST + SECOND + DONE
+        events = list()
+        for i in range(0, len(stream), 7):
+            events.extend(framer.feed(stream[i : i + 7]))
+        events.extend(framer.flush())
+
+        assert len(events) == 3
+        assert data(events[0])["metadata"] == METADATA
+        assert data(events[0])["choices"] == data(FIRST)["choices"]
+        assert events[1:] == [SECOND, DONE]
+
+    def test_separator_split_across_reads(self):
+        """Test an event whose separator is split across two reads."""
+        framer = SSEFramer()
+        assert framer.feed(FIRST[:-1]) == []
+        assert framer.feed(FIRST[-1:] + SECOND) == [FIRST, SECOND]
+
+    def test_done_first_event(self):
+        """Test metadata sent as a dedicated event when [DONE] is the first event."""
+        framer = SSEFramer(metadata=METADATA)
+        events = framer.feed(DONE) + framer.flush()
+
+        assert len(events) == 2
+        assert data(events[0]) == {"metadata": METADATA}
+        assert events[1] == DONE
+
+    def test_crlf_separators(self):
+        """Test events separated by \\r\\n\\r\\n."""
+        stream = FIRST.replace(b"\n\n", b"\r\n\r\n") + SECOND.replace(b"\n\n", b"\r\n\r\n") + b"data: [DONE]\r\n\r\n"  # fmt: off
+        received = list()
+        framer = SSEFramer(metadata=METADATA, listeners=[received.append])
+        events = framer.feed(stream[:50]) + framer.feed(stream[50:]) + framer.flush()
+
+        assert len(events) == 3
+        assert all(event.endswith(b"\r\n\r\n") for event in events)
+        assert data(events[0].rstrip())["metadata"] == METADATA
+        assert received[-1] == b"[DONE]"
+        assert len(received) == 3
+
+    def test_untouched_without_metadata(self):
+        """Test that events are forwarded untouched without metadata."""
+        framer = SSEFramer()
+        events = framer.feed(FIRST + SECOND + DONE[:5]) + framer.feed(DONE[5:]) + framer.flush()
+
+        assert b"".join(events) == FIRST + SECOND + DONE
+
+    def test_event_mode(self):
+        """Test metadata sent as a dedicated event before the first upstream event."""
+        framer = SSEFramer(metadata=METADATA, mode="event")
+        events = framer.feed(FIRST) + framer.feed(DONE) + framer.flush()
+
+        assert events == [b'data: {"metadata": ' + json.dumps(METADATA).encode() + b"}\n\n", FIRST, DONE]  # fmt: off
@@ -0,0 +1,75 @@
+import json
+import logging
+import uuid
+
+import pytest
+import requests
+
+from app.schemas.chunks import Chunk, Chunks
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE
+
+DOCUMENTS = 150  # more than one page of chunks
+
+
+@pytest.fixture(scope="class")
+def collection(request):
+    """Upload a file of DOCUMENTS short documents (one chunk each) to a new collection, once per class."""
+    args = {"base_url": request.config.getoption("--base-url"), "api_key": request.config.getoption("--api-key")}  # fmt: off
+    session = requests.session()
+    session.headers = {"Authorization": f"Bearer {args['api_key']}"}
+
+    response = session.get(f"{args['base_url']}/models")
+    assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+    model = [model["id"] for model in response.json()["data"] if model["type"] == EMBEDDINGS_MODEL_TYPE][0]  # fmt: off
+    logging.debug(f"model: {model}")
+
+    collection = f"test-chunks-{uuid.uuid4()}"
+    documents = {"documents": [{"text": f"document {i}", "metadata": {"index": i}} for i in range(DOCUMENTS)]}  # fmt: off
+    files = {"files": ("documents.json", json.dumps(documents), "application/json")}
+    params = {"collection": collection, "embeddings_model": model}
+    response = session.post(f"{args['base_url']}/files", params=params, files=files)
+    assert response.status_code == 200, f"error: upload file ({response.status_code})"
+
+    yield collection
+
+    session.delete(f"{args['base_url']}/collections/{collection}")
+
+
+@pytest.mark.usefixtures("args", "session", "collection")
+class TestChunks:
+    def test_get_chunks_pages(self, args, session, collection):
+        """Test the GET /chunks/{collection} cursor pagination past the first page."""
+        response = session.get(f"{args['base_url']}/chunks/{collection}")
+        assert response.status_code == 200, f"error: retrieve chunks ({response.status_code})"
+        page = Chunks(**response.json())
+        assert len(page.data) == 100
+        assert page.has_more and page.after is not None
+
+        ids = [chunk.id for chunk in page.data]
+        while page.has_more:
+            response = session.get(f"{args['base_url']}/chunks/{collection}", params={"after": page.after})  # fmt: off
+            assert response.status_code == 200, f"error: retrieve chunks ({response.status_code})"
+            page = Chunks(**response.json())
+            ids.extend(chunk.id for chunk in page.data)
+
+        assert len(ids) == DOCUMENTS
+        assert len(set(ids)) == DOCUMENTS, "error: duplicated chunks between pages"
+
+    def test_get_chunks_limit(self, args, session, collection):
+        """Test the GET /chunks/{collection} limit parameter."""
+        response = session.get(f"{args['base_url']}/chunks/{collection}", params={"limit": 10})
+        assert response.status_code == 200, f"error: retrieve chunks ({response.status_code})"
+        assert len(response.json()["data"]) == 10
+
+        response = session.get(f"{args['base_url']}/chunks/{collection}", params={"limit": 1001})
+        assert response.status_code == 422, f"error: limit not checked ({response.status_code})"
+
+    def test_export_chunks(self, args, session, collection):
+        """Test the GET /chunks/{collection}/export newline delimited JSON response."""
+        response = session.get(f"{args['base_url']}/chunks/{collection}/export", stream=True)
+        assert response.status_code == 200, f"error: export chunks ({response.status_code})"
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        chunks = [Chunk(**json.loads(line)) for line in response.iter_lines() if line]
+        assert len(chunks) == DOCUMENTS
+        assert sorted(chunk.metadata["index"] for chunk in chunks) == list(range(DOCUMENTS))
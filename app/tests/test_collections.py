@@ -0,0 +1,81 @@
+import json
+import logging
+import uuid
+
+import pytest
+
+from app.schemas.collections import Collection, Collections
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE, LANGUAGE_MODEL_TYPE, PRIVATE_COLLECTION_TYPE
+
+
+@pytest.fixture
+def models(args, session):
+    response = session.get(f"{args['base_url']}/models")
+    assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+    models = {model["type"]: model["id"] for model in response.json()["data"]}
+    logging.debug(f"models: {models}")
+
+    return models
+
+
+@pytest.mark.usefixtures("args", "session", "models")
+class TestCollections:
+    def test_create_collection(self, args, session, models):
+        """Test the POST /collections response status code and schemas."""
+        name = f"test-collections-{uuid.uuid4()}"
+        params = {"name": name, "model": models[EMBEDDINGS_MODEL_TYPE], "description": "test"}
+        response = session.post(f"{args['base_url']}/collections", json=params)
+        assert response.status_code == 200, f"error: create collection ({response.status_code})"
+        collection = Collection(**response.json())
+        assert collection.name == name and collection.type == PRIVATE_COLLECTION_TYPE
+
+        response = session.get(f"{args['base_url']}/collections")
+        assert response.status_code == 200, f"error: retrieve collections ({response.status_code})"
+        collections = Collections(**response.json())
+        assert name in [collection.name for collection in collections.data]
+
+        response = session.post(f"{args['base_url']}/collections", json=params)
+        assert response.status_code == 400, f"error: duplicated collection ({response.status_code})"
+
+        session.delete(f"{args['base_url']}/collections/{name}")
+
+    def test_create_collection_index_profile(self, args, session, models):
+        """Test the POST /collections index profile: unset fields take the server defaults."""
+        name = f"test-collections-{uuid.uuid4()}"
+        params = {"name": name, "model": models[EMBEDDINGS_MODEL_TYPE], "index": {"hnsw": {"m": 32}, "quantization": {"type": "scalar"}}}  # fmt: off
+        response = session.post(f"{args['base_url']}/collections", json=params)
+        assert response.status_code == 200, f"error: create collection ({response.status_code})"
+        collection = Collection(**response.json())
+        assert collection.index.hnsw.m == 32
+        assert collection.index.hnsw.ef_construct is not None, "error: index defaults not merged"
+        assert collection.index.quantization.type == "scalar"
+
+        session.delete(f"{args['base_url']}/collections/{name}")
+
+    def test_create_collection_wrong_model_type(self, args, session, models):
+        """Test the POST /collections response with a language model."""
+        params = {"name": f"test-collections-{uuid.uuid4()}", "model": models[LANGUAGE_MODEL_TYPE]}
+        response = session.post(f"{args['base_url']}/collections", json=params)
+        assert response.status_code == 400, f"error: create collection ({response.status_code})"
+
+    def test_created_collection_kept_without_files(self, args, session, models):
+        """Test that a collection created with POST /collections is kept after the deletion of its last file."""
+        name = f"test-collections-{uuid.uuid4()}"
+        params = {"name": name, "model": models[EMBEDDINGS_MODEL_TYPE]}
+        response = session.post(f"{args['base_url']}/collections", json=params)
+        assert response.status_code == 200, f"error: create collection ({response.status_code})"
+
+        documents = {"documents": [{"text": "hello world"}]}
+        files = {"files": ("documents.json", json.dumps(documents), "application/json")}
+        params = {"collection": name, "embeddings_model": models[EMBEDDINGS_MODEL_TYPE]}
+        response = session.post(f"{args['base_url']}/files", params=params, files=files)
+        assert response.status_code == 200, f"error: upload file ({response.status_code})"
+        file = response.json()["data"][0]["id"]
+
+        response = session.delete(f"{args['base_url']}/files/{name}/{file}")
+        assert response.status_code == 204, f"error: delete file ({response.status_code})"
+
+        response = session.get(f"{args['base_url']}/collections/{name}")
+        assert response.status_code == 200, f"error: collection deleted ({response.status_code})"
+
+        session.delete(f"{args['base_url']}/collections/{name}")
@@ -0,0 +1,46 @@
+import logging
+
+import pytest
+
+from app.schemas.completions import Completions
+from app.schemas.config import LANGUAGE_MODEL_TYPE
+
+
+@pytest.mark.usefixtures("args", "session")
+class TestCompletions:
+    def test_completions_unstreamed_response(self, args, session):
+        """Test the POST /completions response status code and schemas."""
+        # retrieve model
+        response = session.get(f"{args['base_url']}/models")
+        assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+        response_json = response.json()
+        model = [
+            model["id"] for model in response_json["data"] if model["type"] == LANGUAGE_MODEL_TYPE
+        ][0]
+        logging.debug(f"model: {model}")
+
+        params = {"model": model, "prompt": "Hello, how are you?", "stream": False, "max_tokens": 10}
+        response = session.post(f"{args['base_url']}/completions", json=params)
+        assert response.status_code == 200, f"error: retrieve completions ({response.status_code})"
+
+        completions = Completions(**response.json())
+        assert isinstance(completions, Completions)
+
+    def test_completions_streamed_response(self, args, session):
+        """Test the POST /completions streamed response."""
+        # retrieve model
+        response = session.get(f"{args['base_url']}/models")
+        assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+        response_json = response.json()
+        model = [
+            model["id"] for model in response_json["data"] if model["type"] == LANGUAGE_MODEL_TYPE
+        ][0]
+        logging.debug(f"model: {model}")
+
+        params = {"model": model, "prompt": "Hello, how are you?", "stream": True, "max_tokens": 10}
+        response = session.post(f"{args['base_url']}/completions", json=params, stream=True)
+        assert response.status_code == 200, f"error: retrieve completions ({response.status_code})"
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        lines = [line for line in response.iter_lines() if line]
+        assert lines[-1] == b"data: [DONE]", f"error: stream not terminated ({lines[-1]})"
@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+import uuid
+
+import pytest
+
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE
+from app.schemas.jobs import Job
+
+
+def upload(args, session, collection: str) -> str:
+    """Upload a file to a collection and return its ID."""
+    response = session.get(f"{args['base_url']}/models")
+    assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+    model = [model["id"] for model in response.json()["data"] if model["type"] == EMBEDDINGS_MODEL_TYPE][0]  # fmt: off
+    logging.debug(f"model: {model}")
+
+    documents = {"documents": [{"text": f"document {i}"} for i in range(10)]}
+    files = {"files": ("documents.json", json.dumps(documents), "application/json")}
+    params = {"collection": collection, "embeddings_model": model}
+    response = session.post(f"{args['base_url']}/files", params=params, files=files)
+    assert response.status_code == 200, f"error: upload file ({response.status_code})"
+
+    return response.json()["data"][0]["id"]
+
+
+def wait(args, session, job: str, timeout: float = 30) -> Job:
+    """Poll a job until it is finished."""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = session.get(f"{args['base_url']}/jobs/{job}")
+        assert response.status_code == 200, f"error: retrieve job ({response.status_code})"
+        data = Job(**response.json())
+        if data.status in ["succeeded", "failed"] or time.monotonic() > deadline:
+            return data
+        time.sleep(0.5)
+
+
+@pytest.mark.usefixtures("args", "session")
+class TestJobs:
+    def test_delete_collection_in_background(self, args, session):
+        """Test the DELETE /collections/{collection}?background=true job until it succeeds."""
+        collection = f"test-jobs-{uuid.uuid4()}"
+        upload(args, session, collection=collection)
+
+        response = session.delete(f"{args['base_url']}/collections/{collection}", params={"background": True})  # fmt: off
+        assert response.status_code == 202, f"error: delete collection ({response.status_code})"
+        job = Job(**response.json())
+
+        job = wait(args, session, job=job.id)
+        assert job.status == "succeeded", f"error: job {job.status} ({job.detail})"
+        assert job.finished_at is not None
+
+        response = session.get(f"{args['base_url']}/collections/{collection}")
+        assert response.status_code == 404, f"error: collection not deleted ({response.status_code})"
+
+    def test_delete_file_in_background(self, args, session):
+        """Test the DELETE /files/{collection}/{file}?background=true job until it succeeds."""
+        collection = f"test-jobs-{uuid.uuid4()}"
+        file = upload(args, session, collection=collection)
+        upload(args, session, collection=collection)
+
+        response = session.delete(f"{args['base_url']}/files/{collection}/{file}", params={"background": True})  # fmt: off
+        assert response.status_code == 202, f"error: delete file ({response.status_code})"
+
+        job = wait(args, session, job=response.json()["id"])
+        assert job.status == "succeeded", f"error: job {job.status} ({job.detail})"
+
+        response = session.get(f"{args['base_url']}/files/{collection}")
+        assert response.status_code == 200, f"error: retrieve files ({response.status_code})"
+        assert file not in [file["id"] for file in response.json()["data"]]
+
+        session.delete(f"{args['base_url']}/collections/{collection}")
+
+    def test_get_unknown_job(self, args, session):
+        """Test the GET /jobs/{job} response of an unknown job."""
+        response = session.get(f"{args['base_url']}/jobs/{uuid.uuid4()}")
+        assert response.status_code == 404, f"error: retrieve unknown job ({response.status_code})"
@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+
+from app.schemas.config import LANGUAGE_MODEL_TYPE, RERANK_MODEL_TYPE
+from app.schemas.rerank import Reranks
+
+PROMPT = "Quel est le délai de recours contre une décision administrative ?"
+INPUTS = [
+    "Le délai de recours contentieux est de deux mois à compter de la notification de la décision.",
+    "La tour Eiffel mesure 330 mètres.",
+    "Un recours gracieux peut être formé auprès de l'auteur de la décision.",
+    "Les impôts locaux sont payés chaque automne.",
+    "Le tribunal administratif est compétent pour les litiges avec l'administration.",
+    "La recette des crêpes demande de la farine, des œufs et du lait.",
+    "Le silence gardé pendant deux mois par l'administration vaut rejet.",
+]  # more inputs than a usual batch, so that the request is split
+
+
+@pytest.fixture
+def model(args, session):
+    response = session.get(f"{args['base_url']}/models")
+    assert response.status_code == 200, f"error: retrieve models ({response.status_code})"
+    models = [model["id"] for model in response.json()["data"] if model["type"] == RERANK_MODEL_TYPE]
+    if not models:
+        pytest.skip("no reranking model")
+    logging.debug(f"model: {models[0]}")
+
+    return models[0]
+
+
+@pytest.mark.usefixtures("args", "session", "model")
+class TestRerank:
+    def test_rerank_response(self, args, session, model):
+        """Test the POST /rerank response status code and schemas."""
+        params = {"model": model, "prompt": PROMPT, "input": INPUTS}
+        response = session.post(f"{args['base_url']}/rerank", json=params)
+        assert response.status_code == 200, f"error: rerank ({response.status_code})"
+
+        reranks = Reranks(**response.json())
+        assert [rerank.index for rerank in reranks.data] == list(range(len(INPUTS)))
+
+    def test_rerank_scores_in_input_order(self, args, session, model):
+        """Test that the POST /rerank scores are those of the inputs at the same position."""
+        params = {"model": model, "prompt": PROMPT, "input": INPUTS}
+        response = session.post(f"{args['base_url']}/rerank", json=params)
+        assert response.status_code == 200, f"error: rerank ({response.status_code})"
+        scores = [rerank["score"] for rerank in response.json()["data"]]
+
+        for input, score in zip(INPUTS, scores):
+            params = {"model": model, "prompt": PROMPT, "input": [input]}
+            response = session.post(f"{args['base_url']}/rerank", json=params)
+            assert response.status_code == 200, f"error: rerank ({response.status_code})"
+            assert response.json()["data"][0]["score"] == pytest.approx(score, abs=1e-3)
+
+    def test_rerank_wrong_model_type(self, args, session, model):
+        """Test the POST /rerank response with a language model."""
+        response = session.get(f"{args['base_url']}/models")
+        language_model = [model["id"] for model in response.json()["data"] if model["type"] == LANGUAGE_MODEL_TYPE][0]  # fmt: off
+
+        params = {"model": language_model, "prompt": PROMPT, "input": INPUTS}
+        response = session.post(f"{args['base_url']}/rerank", json=params)
+        assert response.status_code == 400, f"error: rerank ({response.status_code})"
+
+    def test_rerank_empty_input(self, args, session, model):
+        """Test the POST /rerank response without inputs."""
+        params = {"model": model, "prompt": PROMPT, "input": []}
+        response = session.post(f"{args['base_url']}/rerank", json=params)
+        assert response.status_code == 422, f"error: rerank ({response.status_code})"
@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.utils.diversity import maximal_marginal_relevance
+
+QUERY = [1.0, 0.0, 0.0]
+VECTORS = [
+    [1.0, 0.2, 0.0],  # the most relevant
+    [1.0, 0.3, 0.0],  # near duplicate of the first one
+    [0.7, 0.0, 0.7],  # relevant and different
+    [0.0, 1.0, 0.0],  # not relevant
+]
+
+
+class TestMaximalMarginalRelevance:
+    def test_relevance_only(self):
+        """Test that lambda_mult=1 ranks by similarity to the query."""
+        assert maximal_marginal_relevance(QUERY, VECTORS, k=4, lambda_mult=1.0) == [0, 1, 2, 3]
+
+    def test_diversity(self):
+        """Test that a near duplicate is selected after a different relevant vector."""
+        assert maximal_marginal_relevance(QUERY, VECTORS, k=3, lambda_mult=0.5) == [0, 2, 1]
+
+    def test_threshold(self):
+        """Test that near duplicates of a selected vector are dropped."""
+        selected = maximal_marginal_relevance(QUERY, VECTORS, k=4, lambda_mult=1.0, threshold=0.95)
+        assert selected == [0, 2, 3]
+
+    def test_negative_similarities(self):
+        """Test that a vector opposite to the selected ones is rewarded, not only unpenalized."""
+        vectors = [
+            [1.0, 0.5, 0.0],  # selected first
+            [0.5, 0.0, 0.87],  # relevance 0.5, similarity 0.45 to the first one
+            [0.02, -1.0, 0.0],  # relevance 0.02, similarity -0.43 to the first one
+        ]
+        # 0.5 * 0.02 + 0.5 * 0.43 > 0.5 * 0.5 - 0.5 * 0.45, while a redundancy clipped to 0 would give 0.01
+        assert maximal_marginal_relevance(QUERY, vectors, k=2, lambda_mult=0.5) == [0, 2]
+
+    def test_inputs(self):
+        """Test numpy arrays, unnormalized vectors, and edge cases."""
+        vectors = np.array(VECTORS) * 3
+        assert maximal_marginal_relevance(np.array(QUERY), vectors, k=2, lambda_mult=1.0) == [0, 1]
+        assert np.array_equal(vectors, np.array(VECTORS) * 3), "error: input mutated"
+        assert maximal_marginal_relevance(QUERY, [], k=2) == []
+        assert maximal_marginal_relevance(QUERY, VECTORS, k=0) == []
+        assert len(maximal_marginal_relevance(QUERY, VECTORS, k=10)) == len(VECTORS)
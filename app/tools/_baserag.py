@@ -1,12 +1,14 @@
-from typing import List, Optional
+import heapq
+from typing import List, Literal, Optional
 
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
 from fastapi import HTTPException
 from qdrant_client.http import models as rest
 
 from app.utils.data import search_multiple_collections, get_collections, get_collection
+from app.utils.embeddings import get_embeddings
+from app.utils.rerank import get_rerank
 from app.schemas.tools import ToolOutput
-from app.schemas.config import EMBEDDINGS_MODEL_TYPE
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE, RERANK_MODEL_TYPE
 
 
 class BaseRAG:
@@ -18,12 +20,17 @@ class BaseRAG:
         collection (Optional[List[str]], optional): List of collections to search in. Defaults to None (all collections).
         file_ids (Optional[List[str]], optional): List of file IDs in the selected collections (after upload files). Defaults to None (all files are selected).
         k (int, optional): Top K per collection. Defaults to 4.
+        rerank_model (Optional[str], optional): Reranking model. The top k chunks are selected by the reranking model among RERANK_CANDIDATES_FACTOR * k chunks found by the search. Defaults to None (no reranking).
+        lambda_mult (Optional[float], optional): Relevance weight of the maximal marginal relevance selection of the chunks, between 0 (diversity only) and 1 (relevance only). Defaults to None (no diversity stage).
+        dedup_threshold (Optional[float], optional): Cosine similarity above which a chunk is dropped as a near duplicate of a selected chunk. Defaults to None (no deduplication).
+        search_mode (Literal["dense", "hybrid"], optional): Dense search, or hybrid search with BM25 sparse vectors for exact terms (e.g. article numbers, acronyms), fused with reciprocal rank fusion. Collections without sparse vectors are searched with dense vectors only. Defaults to "dense".
         prompt_template (Optional[str], optional): Prompt template. Defaults to DEFAULT_PROMPT_TEMPLATE.
 
     DEFAULT_PROMPT_TEMPLATE:
         "Réponds à la question suivante en te basant sur les documents ci-dessous : {prompt}\n\nDocuments :\n\n{documents}"
     """
 
+    RERANK_CANDIDATES_FACTOR = 4
     DEFAULT_PROMPT_TEMPLATE = "Réponds à la question suivante en te basant sur les documents ci-dessous : {prompt}\n\nDocuments :\n\n{documents}"
 
     def __init__(self, clients: dict):
@@ -35,6 +42,10 @@ class BaseRAG:
         collections: Optional[List[str]] = None,
         file_ids: Optional[List[str]] = None,
         k: Optional[int] = 4,
+        search_mode: Optional[Literal["dense", "hybrid"]] = "dense",
+        rerank_model: Optional[str] = None,
+        lambda_mult: Optional[float] = None,
+        dedup_threshold: Optional[float] = None,
         prompt_template: Optional[str] = DEFAULT_PROMPT_TEMPLATE,
         **request,
     ) -> ToolOutput:
@@ -44,10 +55,20 @@ class BaseRAG:
                 detail="Prompt template must contain '{prompt}' and '{documents}' placeholders.",
             )
 
+        if search_mode not in ["dense", "hybrid"]:
+            raise HTTPException(status_code=400, detail="Search mode must be 'dense' or 'hybrid'.")
+
+        if lambda_mult is not None and not 0 <= lambda_mult <= 1:
+            raise HTTPException(status_code=400, detail="lambda_mult must be between 0 and 1.")
+        if dedup_threshold is not None and not -1 <= dedup_threshold <= 1:
+            raise HTTPException(status_code=400, detail="dedup_threshold must be between -1 and 1.")
+
         if collections:
-            collections = [get_collection(vectorstore=self.clients["vectors"], user=request["user"], collection=collection) for collection in collections]  # fmt: off
+            collections = [await get_collection(cache=self.clients["collections"], user=request["user"], collection=collection) for collection in collections]  # fmt: off
         else:
-            collections = get_collections(vectorstore=self.clients["vectors"], user=request["user"])
+            collections = (
+                await get_collections(cache=self.clients["collections"], user=request["user"])
+            ).data
 
         for collection in collections:
             if collection.model != embeddings_model:
@@ -56,24 +77,30 @@ class BaseRAG:
                     detail=f"{collection.name} collection is set for {embeddings_model} model.",
                 )
 
-        embedding = HuggingFaceEndpointEmbeddings(
-            model=str(self.clients["models"][embeddings_model].base_url).removesuffix("v1/"),
-            huggingfacehub_api_token=self.clients["models"][embeddings_model].api_key,
-        )
+        if self.clients["models"][embeddings_model].type != EMBEDDINGS_MODEL_TYPE:
+            raise HTTPException(status_code=400, detail=f"Model type must be {EMBEDDINGS_MODEL_TYPE}")  # fmt: off
+        if rerank_model and self.clients["models"][rerank_model].type != RERANK_MODEL_TYPE:
+            raise HTTPException(status_code=400, detail=f"Rerank model type must be {RERANK_MODEL_TYPE}")  # fmt: off
 
         filter = rest.Filter(must=[rest.FieldCondition(key="metadata.file_id", match=rest.MatchAny(any=file_ids))]) if file_ids else None  # fmt: off
         prompt = request["messages"][-1]["content"]
+        vectors, _ = await get_embeddings(model=embeddings_model, inputs=[prompt])
 
-        documents = search_multiple_collections(
+        documents = await search_multiple_collections(
             vectorstore=self.clients["vectors"],
-            embedding=embedding,
-            prompt=prompt,
-            collections=[collections.name for collections in collections],
-            user=request["user"],
-            k=k,
+            vector=vectors[0],
+            collections=collections,
+            k=k * self.RERANK_CANDIDATES_FACTOR if rerank_model else k,
             filter=filter,
+            query=prompt if search_mode == "hybrid" else None,
+            lambda_mult=lambda_mult,
+            dedup_threshold=dedup_threshold,
         )
 
+        if rerank_model and documents:
+            scores = await get_rerank(model=rerank_model, prompt=prompt, inputs=[document.page_content for document in documents])  # fmt: off
+            documents = [document for _, document in heapq.nlargest(k, zip(scores, documents), key=lambda item: item[0])]  # fmt: off
+
         metadata = {"chunks": [document.metadata for document in documents]}
         documents = "\n\n".join([document.page_content for document in documents])
         prompt = prompt_template.format(documents=documents, prompt=prompt)
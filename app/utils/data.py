@@ -1,32 +1,179 @@
-from typing import List, Optional
-
-from fastapi import HTTPException, Response
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchAny, PointIdsList, FilterSelector
+import asyncio
+import base64
+from collections import Counter
+import heapq
+import itertools
+import json
+from typing import AsyncIterator, List, Optional, Union
+import uuid
+
+from fastapi import HTTPException
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import (
+    Filter,
+    FieldCondition,
+    MatchAny,
+    PointIdsList,
+    FilterSelector,
+    PayloadSchemaType,
+    PointStruct,
+    HasIdCondition,
+    VectorParams,
+    Distance,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    CompressionRatio,
+    SearchParams,
+    QuantizationSearchParams,
+    SparseVectorParams,
+    SparseVector,
+    Modifier,
+    ScoredPoint,
+)
 from boto3 import client as Boto3Client
 from botocore.exceptions import ClientError
-from langchain_qdrant import QdrantVectorStore
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from langchain.docstore.document import Document as LangchainDocument
 
-from app.schemas.chunks import Chunk
+from app.helpers import BM25Encoder, CollectionsCache
+from app.schemas.chunks import Chunk, Chunks
 from app.schemas.collections import Collection, Collections
+from app.schemas.files import File
 from app.utils.config import LOGGER
-from app.schemas.config import METADATA_COLLECTION, PUBLIC_COLLECTION_TYPE, PRIVATE_COLLECTION_TYPE
+from app.utils.diversity import maximal_marginal_relevance
+from app.schemas.config import (
+    FILES_COLLECTION,
+    METADATA_COLLECTION,
+    PUBLIC_COLLECTION_TYPE,
+    PRIVATE_COLLECTION_TYPE,
+    Index,
+)
+
+# keyword payload indexes of the filtered fields
+METADATA_PAYLOAD_INDEXES = ["name", "user", "type"]
+FILES_PAYLOAD_INDEXES = ["collection"]
+CHUNKS_PAYLOAD_INDEXES = ["metadata.file_id"]
+DELETE_BATCH_SIZE = 1000
+UPSERT_BATCH_SIZE = 256  # chunks per upsert request
+BACKFILL_CONCURRENCY = 16  # concurrent heads of the objects of a collection uploaded before manifests
+
+# sparse vectors of the chunks, for hybrid search
+SPARSE_VECTOR_NAME = "bm25"
+SPARSE_ENCODER = BM25Encoder()
+HYBRID_PREFETCH_FACTOR = 4  # candidates of the dense and sparse searches fused in the top k
+RRF_K = 60  # rank constant of reciprocal rank fusion
+DIVERSITY_CANDIDATES_FACTOR = 4  # candidates for maximal marginal relevance, per selected chunk
+MAX_DIVERSITY_CANDIDATES = 100  # candidates for maximal marginal relevance, across all collections
+
+
+async def create_payload_indexes(
+    vectorstore: AsyncQdrantClient, collection: str, fields: List[str]
+):
+    """
+    Create the missing keyword payload indexes of a collection.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (str): The collection name.
+        fields (List[str]): The indexed payload fields.
+    """
+    schema = (await vectorstore.get_collection(collection_name=collection)).payload_schema
+    for field in fields:
+        if field in schema and schema[field].data_type == PayloadSchemaType.KEYWORD:
+            continue
+        if field in schema:  # indexed with another type
+            await vectorstore.delete_payload_index(
+                collection_name=collection, field_name=field, wait=True
+            )
+        LOGGER.info(f"create {field} payload index of {collection} collection")
+        await vectorstore.create_payload_index(collection_name=collection, field_name=field, field_schema=PayloadSchemaType.KEYWORD, wait=True)  # fmt: off
+
+
+async def repair_payload_indexes(vectorstore: AsyncQdrantClient):
+    """
+    Create the missing payload indexes of the metadata collection and of all chunk collections.
 
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+    """
+    await create_payload_indexes(vectorstore=vectorstore, collection=METADATA_COLLECTION, fields=METADATA_PAYLOAD_INDEXES)  # fmt: off
+    await create_payload_indexes(vectorstore=vectorstore, collection=FILES_COLLECTION, fields=FILES_PAYLOAD_INDEXES)  # fmt: off
+
+    offset = None
+    while True:
+        points, offset = await vectorstore.scroll(collection_name=METADATA_COLLECTION, limit=1000, offset=offset)  # fmt: off
+        for point in points:
+            try:
+                await create_payload_indexes(vectorstore=vectorstore, collection=point.payload["id"], fields=CHUNKS_PAYLOAD_INDEXES)  # fmt: off
+            except Exception as e:
+                LOGGER.warning(f"payload indexes of {point.payload['name']} collection not repaired: {e}")  # fmt: off
+        if offset is None:
+            break
+
+
+def encode_cursor(offset: Optional[Union[int, str]]) -> Optional[str]:
+    """
+    Encode a Qdrant scroll offset into an opaque pagination cursor.
+    """
+    if offset is None:
+        return None
+
+    return base64.urlsafe_b64encode(json.dumps(offset).encode("utf-8")).decode("ascii")
 
-def get_chunks(
-    vectorstore: QdrantClient,
+
+def decode_cursor(after: Optional[str]) -> Optional[Union[int, str]]:
+    """
+    Decode a pagination cursor into a Qdrant scroll offset.
+    """
+    if after is None:
+        return None
+
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(after.encode("ascii")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    if not isinstance(offset, (int, str)):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    return offset
+
+
+async def get_chunks(
+    vectorstore: AsyncQdrantClient,
     collection: str,
     filter: Optional[Filter] = None,
-) -> List[Chunk]:
+    limit: int = 100,
+    after: Optional[str] = None,
+) -> Chunks:
+    """
+    Get a page of chunks from a collection.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (str): The collection ID.
+        filter (Optional[Filter]): Filter on the chunks.
+        limit (int): The maximum number of chunks of the page.
+        after (Optional[str]): The cursor of the page, returned with the previous page. Defaults to None (first page).
+
+    Returns:
+        Chunks: The chunks, with the cursor of the next page if there are more chunks.
+    """
     try:
-        chunks = vectorstore.scroll(
+        chunks, offset = await vectorstore.scroll(
             collection_name=collection,
             with_payload=True,
             with_vectors=False,
             scroll_filter=filter,
-            limit=100,  # @TODO: add pagination
-        )[0]
+            limit=limit,
+            offset=decode_cursor(after),
+        )
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=404, detail="chunk not found.")
 
@@ -41,41 +188,200 @@ def get_chunks(
             )
         )
 
-    return data
+    return Chunks(data=data, has_more=offset is not None, after=encode_cursor(offset))
 
 
-def search_multiple_collections(
-    vectorstore: QdrantClient,
-    embedding: HuggingFaceEndpointEmbeddings,
-    prompt: str,
-    collections: list,
-    user: str,
+async def iter_chunks(
+    vectorstore: AsyncQdrantClient,
+    collection: str,
+    filter: Optional[Filter] = None,
+    page_size: int = 256,
+) -> AsyncIterator[Chunk]:
+    """
+    Iterate over all the chunks of a collection, page by page.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (str): The collection ID.
+        filter (Optional[Filter]): Filter on the chunks.
+        page_size (int): The number of chunks requested at once.
+    """
+    after = None
+    while True:
+        chunks = await get_chunks(vectorstore=vectorstore, collection=collection, filter=filter, limit=page_size, after=after)  # fmt: off
+        for chunk in chunks.data:
+            yield chunk
+        if not chunks.has_more:
+            return
+        after = chunks.after
+
+
+def _quantization_config(index: Index) -> Optional[Union[ScalarQuantization, BinaryQuantization, ProductQuantization]]:  # fmt: off
+    quantization = index.quantization
+    if quantization is None:
+        return None
+    if quantization.type == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=quantization.quantile, always_ram=quantization.always_ram))  # fmt: off
+    if quantization.type == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=quantization.always_ram)
+        )
+    return ProductQuantization(product=ProductQuantizationConfig(compression=CompressionRatio(quantization.compression), always_ram=quantization.always_ram))  # fmt: off
+
+
+def _search_params(index: Optional[Index]) -> Optional[SearchParams]:
+    if index is None:  # collection created before index profiles, with the Qdrant defaults
+        return None
+    quantization = QuantizationSearchParams(rescore=index.search.rescore, oversampling=index.search.oversampling) if index.quantization else None  # fmt: off
+
+    return SearchParams(hnsw_ef=index.search.hnsw_ef, quantization=quantization)
+
+
+async def create_collection(vectorstore: AsyncQdrantClient, collection: Collection, size: int):
+    """
+    Create a chunk collection with its index profile (quantization, HNSW graph, on-disk storage),
+    its payload indexes and its metadata.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (Collection): The collection metadata, with its index profile.
+        size (int): The dimension of the vectors of the embeddings model of the collection.
+    """
+    index = collection.index
+    # distance and unnamed vector are those expected by langchain QdrantVectorStore
+    await vectorstore.create_collection(
+        collection_name=collection.id,
+        vectors_config=VectorParams(size=size, distance=Distance.COSINE, on_disk=index.on_disk),
+        hnsw_config=HnswConfigDiff(m=index.hnsw.m, ef_construct=index.hnsw.ef_construct, on_disk=index.on_disk),  # fmt: off
+        quantization_config=_quantization_config(index=index),
+        on_disk_payload=index.on_disk_payload,
+        sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)} if index.sparse else None,  # fmt: off
+    )
+    await create_payload_indexes(vectorstore=vectorstore, collection=collection.id, fields=CHUNKS_PAYLOAD_INDEXES)  # fmt: off
+    await vectorstore.upsert(
+        collection_name=METADATA_COLLECTION,
+        points=[PointStruct(id=collection.id, payload=collection.model_dump(mode="json") | {"manifest": collection.manifest, "explicit": collection.explicit}, vector={})],  # fmt: off
+    )
+
+
+def has_sparse_vectors(collection: Collection) -> bool:
+    """
+    Check if the chunks of a collection have sparse vectors (collections created before index profiles have not).
+    """
+    return collection.index is not None and collection.index.sparse
+
+
+async def _dense_search(vectorstore: AsyncQdrantClient, vector: List[float], collection: Collection, k: int, filter: Optional[Filter]) -> List[ScoredPoint]:  # fmt: off
+    params = _search_params(index=collection.index)
+    return await vectorstore.search(collection_name=collection.id, query_vector=vector, query_filter=filter, limit=k, with_payload=True, search_params=params)  # fmt: off
+
+
+async def _sparse_search(vectorstore: AsyncQdrantClient, vector: SparseVector, collection: Collection, k: int, filter: Optional[Filter]) -> List[ScoredPoint]:  # fmt: off
+    if not has_sparse_vectors(collection=collection):
+        return []
+    response = await vectorstore.query_points(collection_name=collection.id, query=vector, using=SPARSE_VECTOR_NAME, query_filter=filter, limit=k, with_payload=True)  # fmt: off
+    return response.points
+
+
+async def _dense_vectors(vectorstore: AsyncQdrantClient, hits: List[ScoredPoint], origins: dict) -> List[List[float]]:  # fmt: off
+    """
+    Retrieve the dense vectors of chunks, with one request per collection.
+    """
+    ids = dict()
+    for hit in hits:
+        ids.setdefault(origins[hit.id], []).append(hit.id)
+    results = await asyncio.gather(*[vectorstore.retrieve(collection_name=collection, ids=chunks, with_payload=False, with_vectors=True) for collection, chunks in ids.items()])  # fmt: off
+    # chunks with sparse vectors have named vectors, the dense vector is unnamed
+    vectors = {point.id: point.vector[""] if isinstance(point.vector, dict) else point.vector for point in itertools.chain.from_iterable(results)}  # fmt: off
+
+    return [vectors[hit.id] for hit in hits]
+
+
+def _reciprocal_rank_fusion(rankings: List[List[ScoredPoint]]) -> List[ScoredPoint]:
+    """
+    Fuse ranked lists of chunks: the score of a chunk is the sum of 1 / (RRF_K + rank) over the lists.
+    """
+    hits, scores = dict(), Counter()
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            hits.setdefault(hit.id, hit)
+            scores[hit.id] += 1 / (RRF_K + rank)
+
+    return [hits[id].model_copy(update={"score": score}) for id, score in scores.most_common()]
+
+
+async def search_multiple_collections(
+    vectorstore: AsyncQdrantClient,
+    vector: List[float],
+    collections: List[Collection],
     k: Optional[int] = 4,
-    filter: Optional[dict] = None,
-):
-    docs = []
+    filter: Optional[Filter] = None,
+    query: Optional[str] = None,
+    lambda_mult: Optional[float] = None,
+    dedup_threshold: Optional[float] = None,
+) -> List[LangchainDocument]:
+    """
+    Search the top k chunks of several collections, with an embedded query.
 
-    for collection in collections:
-        collection = get_collection(vectorstore=vectorstore, user=user, collection=collection)
-        lanchain_qdrant = QdrantVectorStore(
-            client=vectorstore,
-            embedding=embedding,
-            collection_name=collection.id,
+    With lambda_mult or dedup_threshold, the top DIVERSITY_CANDIDATES_FACTOR * k chunks of all collections
+    (at most MAX_DIVERSITY_CANDIDATES) are candidates, their vectors are retrieved, and k chunks are
+    selected among them with maximal marginal relevance, without near duplicates (e.g. a passage
+    uploaded in several files).
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        vector (List[float]): The query vector.
+        collections (List[Collection]): The collections to search in.
+        k (int): The number of chunks to return.
+        filter (Optional[Filter]): Filter applied in each collection.
+        query (Optional[str]): The query text, for a hybrid search: dense and BM25 sparse rankings of all collections fused with RRF (collections without sparse vectors are only in the dense ranking). Defaults to None (dense search).
+        lambda_mult (Optional[float]): Relevance weight of maximal marginal relevance, between 0 (diversity only) and 1 (relevance only). Defaults to None (1 if dedup_threshold is set, else no diversity stage).
+        dedup_threshold (Optional[float]): Cosine similarity above which a chunk is a duplicate of a selected chunk. Defaults to None (no deduplication).
+
+    Returns:
+        List[LangchainDocument]: The chunks, sorted by decreasing score (or in the order of selection, with a diversity stage).
+    """
+    diversity = lambda_mult is not None or dedup_threshold is not None
+    limit = (
+        max(k, min(k * DIVERSITY_CANDIDATES_FACTOR, MAX_DIVERSITY_CANDIDATES)) if diversity else k
+    )
+
+    # collections are searched concurrently with the search parameters of their index profile
+    if query is None:
+        results = await asyncio.gather(*[_dense_search(vectorstore=vectorstore, vector=vector, collection=collection, k=limit, filter=filter) for collection in collections])  # fmt: off
+        candidates = heapq.nlargest(limit, itertools.chain.from_iterable(results), key=lambda hit: hit.score)  # fmt: off
+    else:
+        # hybrid search: the dense rankings of the collections (same embeddings model) are merged in a
+        # single ranking, the sparse rankings as well, and both are fused with reciprocal rank fusion
+        prefetch = limit * HYBRID_PREFETCH_FACTOR
+        sparse_vector = SPARSE_ENCODER.embed_query(query)
+        sparse_vector = SparseVector(indices=sparse_vector.indices, values=sparse_vector.values)
+        results = await asyncio.gather(
+            *[_dense_search(vectorstore=vectorstore, vector=vector, collection=collection, k=prefetch, filter=filter) for collection in collections],  # fmt: off
+            *[_sparse_search(vectorstore=vectorstore, vector=sparse_vector, collection=collection, k=prefetch, filter=filter) for collection in collections],  # fmt: off
         )
-        docs.extend(lanchain_qdrant.similarity_search_with_score(prompt, k=k, filter=filter))
-    # sort by similarity score and get top k
-    docs = sorted(docs, key=lambda x: x[1], reverse=True)[:k]
-    docs = [doc[0] for doc in docs]
+        dense = heapq.nlargest(prefetch, itertools.chain.from_iterable(results[: len(collections)]), key=lambda hit: hit.score)  # fmt: off
+        sparse = heapq.nlargest(prefetch, itertools.chain.from_iterable(results[len(collections) :]), key=lambda hit: hit.score)  # fmt: off
+        candidates = _reciprocal_rank_fusion(rankings=[dense, sparse])[:limit]
+
+    if diversity:
+        # vectors are only retrieved for the candidates, not for all the chunks searched in each collection
+        origins = {hit.id: collection.id for collection, ranking in zip(itertools.cycle(collections), results) for hit in ranking}  # fmt: off
+        vectors = await _dense_vectors(vectorstore=vectorstore, hits=candidates, origins=origins)
+        selected = maximal_marginal_relevance(query_vector=vector, vectors=vectors, k=k, lambda_mult=1.0 if lambda_mult is None else lambda_mult, threshold=dedup_threshold)  # fmt: off
+        hits = [candidates[index] for index in selected]
+    else:
+        hits = candidates
 
-    return docs
+    return [LangchainDocument(page_content=hit.payload["page_content"], metadata=hit.payload["metadata"]) for hit in hits]  # fmt: off
 
 
-def get_collections(vectorstore: QdrantClient, user: str, type: str = "all") -> Collections:
+async def get_collections(cache: CollectionsCache, user: str, type: str = "all") -> Collections:
     """
-    Get all collections from a vectorstore.
+    Get all collections of a user.
 
     Parameters:
-        vectorstore (Qdrant): The vectorstore to get the collections from.
+        cache (CollectionsCache): The collections metadata cache.
         user (str): The user to get the collections for.
         type (str): The type of collections to get. "all" (default) will get all collections. "public" will get only public collections. "private" will get only private collections.
 
@@ -88,34 +394,20 @@ def get_collections(vectorstore: QdrantClient, user: str, type: str = "all") ->
         PRIVATE_COLLECTION_TYPE,
     ], "type must be 'all', 'public' or 'private'"
 
-    if type == "all":
-        must = []
-        should = [
-            FieldCondition(key="user", match=MatchAny(any=[user])),
-            FieldCondition(key="type", match=MatchAny(any=[PUBLIC_COLLECTION_TYPE])),
-        ]
-    elif type == PUBLIC_COLLECTION_TYPE:
-        must = [FieldCondition(key="type", match=MatchAny(any=[PUBLIC_COLLECTION_TYPE]))]
-        should = []
-    elif type == PRIVATE_COLLECTION_TYPE:
-        must = [FieldCondition(key="user", match=MatchAny(any=[user]))]
-        should = []
-
-    filter = Filter(must=must, should=should)
-    data = vectorstore.scroll(collection_name=METADATA_COLLECTION, scroll_filter=filter)[0]
+    data = [collection for collection in (await cache.get(user=user)).values() if type == "all" or collection.type == type]  # fmt: off
     LOGGER.debug(f"collections: {data}")
 
-    return Collections(data=[Collection(**row.payload) for row in data])
+    return Collections(data=data)
 
 
-def get_collection(
-    vectorstore: QdrantClient, user: str, collection: str, type: str = "all", errors: str = "raise"
+async def get_collection(
+    cache: CollectionsCache, user: str, collection: str, type: str = "all", errors: str = "raise"
 ) -> Optional[Collection]:
     """
-    Get a collection from a vectorstore.
+    Get a collection of a user.
 
     Parameters:
-        vectorstore (Qdrant): The vectorstore to get the collection from.
+        cache (CollectionsCache): The collections metadata cache.
         collection (str): The name of the collection to get.
         user (str): The user to get the collection for.
         type (str): The type of collection to get. "all" (default) will get all collections. "public" will get only public collections. "private" will get only private collections.
@@ -131,87 +423,282 @@ def get_collection(
         PRIVATE_COLLECTION_TYPE,
     ], "type must be 'all', 'public' or 'private'"
 
-    must = [FieldCondition(key="name", match=MatchAny(any=[collection]))]
-    if type == "all":
-        should = [
-            FieldCondition(key="user", match=MatchAny(any=[user])),
-            FieldCondition(key="type", match=MatchAny(any=[PUBLIC_COLLECTION_TYPE])),
-        ]
-    elif type == PUBLIC_COLLECTION_TYPE:
-        must.append(FieldCondition(key="type", match=MatchAny(any=[PUBLIC_COLLECTION_TYPE])))
-        should = []
-    elif type == PRIVATE_COLLECTION_TYPE:
-        must.append(FieldCondition(key="user", match=MatchAny(any=[user])))
-
-    filter = Filter(must=must, should=should)
-    data = vectorstore.scroll(collection_name=METADATA_COLLECTION, scroll_filter=filter)[0]
+    data = (await cache.get(user=user)).get(collection)
     LOGGER.debug(f"{collection} collection: {data}")
 
-    if data:
-        return Collection(**data[0].payload)
+    if data and (type == "all" or data.type == type):
+        return data
     elif errors == "raise":
         raise HTTPException(status_code=404, detail="Collection not found.")
 
 
-def delete_contents(
+async def add_chunks(vectorstore: AsyncQdrantClient, collection: Collection, documents: List[LangchainDocument], vectors: List[List[float]]) -> List[str]:  # fmt: off
+    """
+    Store the chunks of a file in a collection, with their BM25 sparse vectors if the collection has
+    sparse vectors. The payload is the one of langchain QdrantVectorStore.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (Collection): The collection.
+        documents (List[LangchainDocument]): The chunks.
+        vectors (List[List[float]]): The dense vectors of the chunks, in the same order.
+
+    Returns:
+        List[str]: The IDs of the chunks.
+    """
+    ids = [str(uuid.uuid4()) for _ in documents]
+    texts = [document.page_content for document in documents]
+    if has_sparse_vectors(collection=collection):
+        sparse_vectors = [SparseVector(indices=vector.indices, values=vector.values) for vector in SPARSE_ENCODER.embed_documents(texts)]  # fmt: off
+        vectors = [{"": vector, SPARSE_VECTOR_NAME: sparse_vector} for vector, sparse_vector in zip(vectors, sparse_vectors)]  # fmt: off
+
+    points = [PointStruct(id=id, vector=vector, payload={"page_content": document.page_content, "metadata": document.metadata}) for id, vector, document in zip(ids, vectors, documents)]  # fmt: off
+    for i in range(0, len(points), UPSERT_BATCH_SIZE):
+        await vectorstore.upsert(
+            collection_name=collection.id, points=points[i : i + UPSERT_BATCH_SIZE]
+        )
+
+    return ids
+
+
+async def add_files(vectorstore: AsyncQdrantClient, collection: str, files: List[File]):
+    """
+    Add files to the file manifest of a collection.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (str): The collection ID.
+        files (List[File]): The files metadata.
+    """
+    points = [PointStruct(id=str(file.id), vector={}, payload=file.model_dump(mode="json") | {"collection": collection}) for file in files]  # fmt: off
+    await vectorstore.upsert(collection_name=FILES_COLLECTION, points=points)
+
+
+async def _backfill_files(s3: Boto3Client, vectorstore: AsyncQdrantClient, collection: str) -> List[File]:  # fmt: off
+    """
+    Build the file manifest of a collection uploaded before manifests, from the bucket objects and the chunks.
+    """
+
+    def list_objects() -> List[dict]:
+        pages = s3.get_paginator("list_objects_v2").paginate(Bucket=collection)
+        return [object for page in pages for object in page.get("Contents", [])]
+
+    objects = await asyncio.to_thread(list_objects)
+    if not objects:
+        return []
+
+    chunk_ids = dict()
+    async for chunk in iter_chunks(vectorstore=vectorstore, collection=collection):
+        chunk_ids.setdefault(chunk.metadata.get("file_id"), []).append(chunk.id)
+
+    # filenames are only in the objects metadata, heads are sent concurrently (once per collection)
+    semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+    async def head(key: str) -> dict:
+        async with semaphore:
+            return await asyncio.to_thread(s3.head_object, Bucket=collection, Key=key)
+
+    heads = await asyncio.gather(*[head(key=object["Key"]) for object in objects])
+    files = [
+        File(
+            id=object["Key"],
+            bytes=object["Size"],
+            filename=base64.b64decode(head["Metadata"]["filename"].encode("ascii")).decode("utf-8"),
+            content_type=head.get("ContentType"),
+            chunk_ids=chunk_ids.get(object["Key"], []),
+            created_at=round(object["LastModified"].timestamp()),
+        )
+        for object, head in zip(objects, heads)
+    ]
+    await add_files(vectorstore=vectorstore, collection=collection, files=files)
+    LOGGER.info(f"file manifest of {collection} collection backfilled with {len(files)} files")
+
+    return files
+
+
+async def backfill_files(s3: Boto3Client, vectorstore: AsyncQdrantClient, cache: CollectionsCache, collection: Collection):  # fmt: off
+    """
+    Build the file manifest of a collection uploaded before manifests, once: the collection is then
+    marked as manifested in its metadata.
+
+    Parameters:
+        s3 (Boto3Client): The files storage.
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        cache (CollectionsCache): The collections metadata cache.
+        collection (Collection): The collection.
+    """
+    if collection.manifest:
+        return
+
+    try:
+        await _backfill_files(s3=s3, vectorstore=vectorstore, collection=collection.id)
+    except ClientError:  # no bucket, no files
+        pass
+    await vectorstore.set_payload(collection_name=METADATA_COLLECTION, payload={"manifest": True}, points=[collection.id])  # fmt: off
+    await cache.invalidate(user=collection.user)
+    collection.manifest = True
+
+
+async def get_files(
+    s3: Boto3Client, vectorstore: AsyncQdrantClient, cache: CollectionsCache, collection: Collection, file: Optional[str] = None
+) -> List[File]:  # fmt: off
+    """
+    Get files from the file manifest of a collection. The manifest of a collection uploaded before
+    manifests is built on first access.
+
+    Parameters:
+        s3 (Boto3Client): The files storage.
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        cache (CollectionsCache): The collections metadata cache.
+        collection (Collection): The collection.
+        file (Optional[str]): The ID of a file to get. Defaults to None (all files).
+
+    Returns:
+        List[File]: The files metadata, empty if the file is not found.
+    """
+    await backfill_files(s3=s3, vectorstore=vectorstore, cache=cache, collection=collection)
+
+    if file:
+        try:
+            points = await vectorstore.retrieve(collection_name=FILES_COLLECTION, ids=[file])
+        except Exception:  # not a valid file ID
+            return []
+        return [File(**point.payload) for point in points if point.payload["collection"] == collection.id]  # fmt: off
+
+    filter = Filter(must=[FieldCondition(key="collection", match=MatchAny(any=[collection.id]))])
+    files, offset = list(), None
+    while True:
+        points, offset = await vectorstore.scroll(collection_name=FILES_COLLECTION, scroll_filter=filter, limit=1000, offset=offset)  # fmt: off
+        files.extend([File(**point.payload) for point in points])
+        if offset is None:
+            return files
+
+
+async def delete_files(vectorstore: AsyncQdrantClient, collection: str, file: Optional[str] = None):
+    """
+    Delete files from the file manifest of a collection.
+
+    Parameters:
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        collection (str): The collection ID.
+        file (Optional[str]): The ID of a file to delete. Defaults to None (all files).
+    """
+    must = [FieldCondition(key="collection", match=MatchAny(any=[collection]))]
+    if file:
+        must.append(HasIdCondition(has_id=[file]))
+    await vectorstore.delete(collection_name=FILES_COLLECTION, points_selector=FilterSelector(filter=Filter(must=must)))  # fmt: off
+
+
+async def get_deletable_collections(
     s3: Boto3Client,
-    vectorstore: QdrantClient,
+    cache: CollectionsCache,
     user: str,
     collection: Optional[str] = None,
     file: Optional[str] = None,
-) -> Response:
+) -> List[Collection]:
+    """
+    Get and check the collections whose contents are deleted by a request, before any deletion.
+
+    Parameters:
+        s3 (Boto3Client): The files storage.
+        cache (CollectionsCache): The collections metadata cache.
+        user (str): The user.
+        collection (Optional[str]): The name of the collection. Defaults to None (all private collections of the user).
+        file (Optional[str]): The ID of a file of the collection. Defaults to None (all files).
+
+    Returns:
+        List[Collection]: The collections.
+    """
     if collection:
-        collection = get_collection(vectorstore=vectorstore, user=user, collection=collection)
+        collection = await get_collection(cache=cache, user=user, collection=collection)
         if collection.type == PUBLIC_COLLECTION_TYPE:
             raise HTTPException(status_code=400, detail="A public collection can not deleted")
         collections = [collection]
 
     else:
-        collections = get_collections(
-            vectorstore=vectorstore, user=user, type=PRIVATE_COLLECTION_TYPE
-        )
+        collections = (
+            await get_collections(cache=cache, user=user, type=PRIVATE_COLLECTION_TYPE)
+        ).data
 
     for collection in collections:
         try:
-            s3.head_bucket(Bucket=collection.id)
+            await asyncio.to_thread(s3.head_bucket, Bucket=collection.id)
         except ClientError:
             raise HTTPException(status_code=404, detail=f"Files not found for collection {collection}")  # fmt: off
 
-        objects = s3.list_objects_v2(Bucket=collection.id).get("Contents", [])
-        objects = [{"Key": object["Key"]} for object in objects]
-        LOGGER.debug(f"objects: {objects}")
-
-        # if bucket is empty, delete it and the collection
-        if not objects:
-            s3.delete_bucket(Bucket=collection.id)
-            vectorstore.delete_collection(collection.id)
-            vectorstore.delete(collection_name=METADATA_COLLECTION, points_selector=PointIdsList(points=[collection.id]))  # fmt: off
-
-        # delete all files
-        elif file is None:
-            # delete bucket, collection and metadata collection
-            s3.delete_objects(Bucket=collection.id, Delete={"Objects": objects})
-            s3.delete_bucket(Bucket=collection.id)
-            vectorstore.delete_collection(collection.id)
-            vectorstore.delete(collection_name=METADATA_COLLECTION, points_selector=PointIdsList(points=[collection.id]))  # fmt: off
-
-        # delete a file and his chunks
-        else:
-            if file not in [object["Key"] for object in objects]:
+        if file:
+            try:
+                await asyncio.to_thread(s3.head_object, Bucket=collection.id, Key=file)
+            except ClientError:
                 raise HTTPException(status_code=404, detail=f"File not found in the collection {collection}")  # fmt: off
 
-            s3.delete_object(Bucket=collection.id, Key=file)
-            filter = Filter(must=[FieldCondition(key="metadata.file_id", match=MatchAny(any=[file]))])  # fmt: off
-            vectorstore.delete(
-                collection_name=collection.id, points_selector=FilterSelector(filter=filter)
-            )
+    return collections
+
+
+async def _delete_collection(s3: Boto3Client, vectorstore: AsyncQdrantClient, collection: Collection):  # fmt: off
+    """
+    Delete a collection: its bucket with all its objects, its chunks, its metadata and its file manifest.
+    """
 
-            # if the deleted file is the last, delete bucket and collection
-            if len(objects) == 1:
-                # delete bucket, collection and metadata collection
-                s3.delete_objects(Bucket=collection.id, Delete={"Objects": objects})
-                s3.delete_bucket(Bucket=collection.id)
-                vectorstore.delete_collection(collection.id)
-                vectorstore.delete(collection_name=METADATA_COLLECTION, points_selector=PointIdsList(points=[collection.id]))  # fmt: off
+    def list_keys() -> List[str]:
+        pages = s3.get_paginator("list_objects_v2").paginate(Bucket=collection.id)
+        return [object["Key"] for page in pages for object in page.get("Contents", [])]
 
-    return Response(status_code=204)
+    keys = await asyncio.to_thread(list_keys)
+    LOGGER.debug(f"delete {len(keys)} objects of {collection.id} bucket")
+
+    # objects are deleted by batches of 1000 keys (the S3 limit), sent concurrently
+    batches = [keys[i : i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+    results = await asyncio.gather(
+        *[asyncio.to_thread(s3.delete_objects, Bucket=collection.id, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}) for batch in batches]  # fmt: off
+    )
+    errors = [error for result in results for error in result.get("Errors", [])]
+    if errors:
+        raise HTTPException(status_code=500, detail=f"{len(errors)} files of collection {collection.name} not deleted: {errors[0]}")  # fmt: off
+
+    await asyncio.to_thread(s3.delete_bucket, Bucket=collection.id)
+    await vectorstore.delete_collection(collection.id)
+    await vectorstore.delete(collection_name=METADATA_COLLECTION, points_selector=PointIdsList(points=[collection.id]))  # fmt: off
+    await delete_files(vectorstore=vectorstore, collection=collection.id)
+
+
+async def _delete_file(s3: Boto3Client, vectorstore: AsyncQdrantClient, collection: Collection, file: str):  # fmt: off
+    """
+    Delete a file of a collection and its chunks, and the collection if the file was the last one (collections created by an upload only).
+    """
+    await asyncio.to_thread(s3.delete_object, Bucket=collection.id, Key=file)
+    filter = Filter(must=[FieldCondition(key="metadata.file_id", match=MatchAny(any=[file]))])
+    await vectorstore.delete(collection_name=collection.id, points_selector=FilterSelector(filter=filter))  # fmt: off
+    await delete_files(vectorstore=vectorstore, collection=collection.id, file=file)
+
+    # if the deleted file is the last, delete bucket and collection, unless it was created explicitly
+    if not collection.explicit and not (await asyncio.to_thread(s3.list_objects_v2, Bucket=collection.id, MaxKeys=1)).get("KeyCount"):  # fmt: off
+        await _delete_collection(s3=s3, vectorstore=vectorstore, collection=collection)
+
+
+async def delete_contents(
+    s3: Boto3Client,
+    vectorstore: AsyncQdrantClient,
+    cache: CollectionsCache,
+    user: str,
+    collections: List[Collection],
+    file: Optional[str] = None,
+):
+    """
+    Delete collections, or a file of a collection, concurrently (see get_deletable_collections).
+
+    Parameters:
+        s3 (Boto3Client): The files storage.
+        vectorstore (AsyncQdrantClient): The vectorstore.
+        cache (CollectionsCache): The collections metadata cache.
+        user (str): The user.
+        collections (List[Collection]): The collections.
+        file (Optional[str]): The ID of a file of the collections. Defaults to None (the whole collections are deleted).
+    """
+    try:
+        if file:
+            await asyncio.gather(*[_delete_file(s3=s3, vectorstore=vectorstore, collection=collection, file=file) for collection in collections])  # fmt: off
+        else:
+            await asyncio.gather(*[_delete_collection(s3=s3, vectorstore=vectorstore, collection=collection) for collection in collections])  # fmt: off
+    finally:
+        await cache.invalidate(user=user)
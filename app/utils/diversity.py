@@ -0,0 +1,58 @@
+import itertools
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_vector: Union[List[float], np.ndarray],
+    vectors: Union[List[List[float]], np.ndarray],
+    k: int,
+    lambda_mult: float = 0.5,
+    threshold: Optional[float] = None,
+) -> List[int]:
+    """
+    Select k diverse vectors with maximal marginal relevance (MMR): each step selects the vector
+    maximizing lambda_mult * similarity to the query - (1 - lambda_mult) * similarity to the selected
+    vectors. Vectors too similar to a selected vector are dropped as near duplicates.
+
+    Similarities are cosine similarities, computed with one matrix-vector product per step (O(k * n * d)).
+
+    Args:
+        query_vector (Union[List[float], np.ndarray]): The query vector.
+        vectors (Union[List[List[float]], np.ndarray]): The candidate vectors.
+        k (int): The number of vectors to select.
+        lambda_mult (float): Relevance weight, between 0 (diversity only) and 1 (relevance only).
+        threshold (Optional[float]): Cosine similarity above which a candidate is a duplicate of a selected vector. Defaults to None (no deduplication).
+
+    Returns:
+        List[int]: The indices of the selected vectors, in the order of selection.
+    """
+    if len(vectors) == 0 or k <= 0:
+        return []
+
+    if isinstance(vectors, np.ndarray):
+        matrix = np.asarray(vectors, dtype=np.float32)
+    else:  # faster than np.asarray for nested lists
+        matrix = np.fromiter(itertools.chain.from_iterable(vectors), dtype=np.float32, count=len(vectors) * len(vectors[0])).reshape(len(vectors), -1)  # fmt: off
+    query = np.asarray(query_vector, dtype=np.float32)
+
+    # the matrix is not normalized, the products are divided by the norms instead
+    norms = np.maximum(np.sqrt(np.einsum("ij,ij->i", matrix, matrix)), 1e-12)
+    relevance = (matrix @ query) / (norms * max(float(np.linalg.norm(query)), 1e-12))
+    redundancy = np.full(len(matrix), -np.inf, dtype=np.float32)  # maximum similarity to the selected vectors
+    available = np.ones(len(matrix), dtype=bool)
+
+    selected = list()
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy if selected else relevance.copy()  # fmt: off
+        scores[~available] = -np.inf
+        index = int(np.argmax(scores))
+        selected.append(index)
+        available[index] = False
+
+        redundancy = np.maximum(redundancy, (matrix @ matrix[index]) / (norms * norms[index]))
+        if threshold is not None:
+            available &= redundancy < threshold
+
+    return selected
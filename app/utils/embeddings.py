@@ -0,0 +1,37 @@
+from typing import List, Tuple
+
+from app.utils.lifespan import clients
+from app.utils.upstream import track
+from app.schemas.config import INTERACTIVE_PRIORITY
+
+
+async def get_embeddings(
+    model: str, inputs: List[str], priority: int = INTERACTIVE_PRIORITY
+) -> Tuple[List[List[float]], int]:
+    """
+    Embed texts, cached vectors are served from the embeddings cache and only the missing ones are
+    sent to the embeddings batcher of the model.
+
+    Args:
+        model (str): The embeddings model ID.
+        inputs (List[str]): Texts to embed.
+        priority (int): Admission priority of the request.
+
+    Returns:
+        Tuple[List[List[float]], int]: Embeddings in the order of the inputs and the number of prompt tokens sent to the model.
+    """
+    client = clients["models"][model]
+    cache = clients["embeddings_cache"]
+
+    vectors = await cache.get(model=model, texts=inputs)
+    missing = list(dict.fromkeys(input for input, vector in zip(inputs, vectors) if vector is None))
+    if not missing:
+        return vectors, 0
+
+    async with track(client, priority=priority):
+        embeddings, prompt_tokens = await client.batchers[model].embed(inputs=missing)
+    await cache.set(model=model, texts=missing, vectors=embeddings)
+    embeddings = dict(zip(missing, embeddings))
+    vectors = [embeddings[input] if vector is None else vector for input, vector in zip(inputs, vectors)]  # fmt: off
+
+    return vectors, prompt_tokens
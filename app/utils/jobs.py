@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Coroutine
+import uuid
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+
+from app.schemas.jobs import Job
+from app.utils.config import LOGGER
+
+JOBS_PREFIX = "jobs"
+JOBS_EXPIRATION = 86400  # 1 day
+
+
+def _key(job: str) -> str:
+    return f"{JOBS_PREFIX}:{job}"
+
+
+async def _save(redis: Redis, job: Job, user: str):
+    data = json.dumps({"user": user, "job": job.model_dump(mode="json")})
+    await redis.setex(_key(job.id), JOBS_EXPIRATION, data)
+
+
+async def create_job(redis: Redis, user: str) -> Job:
+    """
+    Create a pending job of a user, kept in Redis for a day so that all workers can report its status.
+
+    Parameters:
+        redis (Redis): Redis client.
+        user (str): The user.
+
+    Returns:
+        Job: The job.
+    """
+    job = Job(id=str(uuid.uuid4()), created_at=round(time.time()))
+    await _save(redis=redis, job=job, user=user)
+
+    return job
+
+
+async def run_job(redis: Redis, job: Job, user: str, coroutine: Coroutine):
+    """
+    Run a job (e.g. as a background task) and record its status.
+
+    Parameters:
+        redis (Redis): Redis client.
+        job (Job): The job.
+        user (str): The user.
+        coroutine (Coroutine): The work of the job.
+    """
+    job.status = "running"
+    await _save(redis=redis, job=job, user=user)
+    try:
+        await coroutine
+        job.status = "succeeded"
+    except HTTPException as e:
+        job.status, job.detail = "failed", e.detail
+    except Exception as e:
+        LOGGER.exception(f"job {job.id} failed")
+        job.status, job.detail = "failed", str(e)
+    job.finished_at = round(time.time())
+    await _save(redis=redis, job=job, user=user)
+
+
+async def get_job(redis: Redis, user: str, job: str) -> Job:
+    """
+    Get a job of a user.
+
+    Parameters:
+        redis (Redis): Redis client.
+        user (str): The user.
+        job (str): The ID of the job.
+
+    Returns:
+        Job: The job.
+    """
+    data = await redis.get(_key(job))
+    data = json.loads(data) if data else None
+    if not data or data["user"] != user:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return Job(**data["job"])
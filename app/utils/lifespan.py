@@ -1,117 +1,149 @@
 from contextlib import asynccontextmanager
-import requests
+import random
 import time
-from functools import partial
 
 from fastapi import FastAPI, HTTPException
+import httpx
 from openai import OpenAI
 
 from app.utils.config import CONFIG, LOGGER
-from app.schemas.config import EMBEDDINGS_MODEL_TYPE, LANGUAGE_MODEL_TYPE, METADATA_COLLECTION
-from app.schemas.models import Model, Models
+from app.schemas.config import EMBEDDINGS_MODEL_TYPE, FILES_COLLECTION, METADATA_COLLECTION
+from app.utils.data import repair_payload_indexes
+from app.helpers import (
+    AdmissionController,
+    CollectionsCache,
+    EmbeddingsBatcher,
+    EmbeddingsCache,
+    ModelRegistry,
+    RateLimiter,
+    ResponseCache,
+    UsageMeter,
+)
 
 
 class ModelDict(dict):
     """
-    Overwrite __getitem__ method to raise a 404 error if model is not found.
+    Map a model ID to the clients of its replicas. Overwrite __getitem__ method to return the
+    least loaded healthy replica (power of two choices on outstanding requests) and to raise a
+    404 error if model is not found.
     """
 
+    def add(self, key: str, client):
+        self.setdefault(key, []).append(client)
+
     def __getitem__(self, key: str):
         try:
-            return super().__getitem__(key)
+            replicas = super().__getitem__(key)
         except KeyError:
             raise HTTPException(status_code=404, detail="Model not found.")
 
+        if len(replicas) == 1:
+            return replicas[0]
+
+        now = time.monotonic()
+        healthy = [client for client in replicas if client.ejected_until <= now]
+        if not healthy:  # all replicas are ejected, try the one to be readmitted first
+            return min(replicas, key=lambda client: client.ejected_until)
+        candidates = random.sample(healthy, min(len(healthy), 2))  # random order breaks ties
+
+        return min(candidates, key=lambda client: client.inflight)
+
 
-clients = {"models": ModelDict(), "cache": None, "vectors": None, "files": None}
+clients = {
+    "models": ModelDict(),
+    "registry": None,
+    "cache": None,
+    "embeddings_cache": None,
+    "chat_completions_cache": None,
+    "rate_limiter": None,
+    "usage": None,
+    "vectors": None,
+    "collections": None,
+    "files": None,
+}
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event to initialize clients (models API and databases)."""
 
-    def get_models_list(self, *args, **kwargs):
+    def register_model(client, model):
         """
-        Custom method to overwrite OpenAI's list method (client.models.list()). This method support
-        embeddings API models deployed with HuggingFace Text Embeddings Inference (see: https://github.com/huggingface/text-embeddings-inference).
+        Make a model discovered by the registry available to the endpoints.
         """
-        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
-        data = list()
-
-        if self.type == LANGUAGE_MODEL_TYPE:
-            endpoint = f"{self.base_url}models"
-            response = requests.get(url=endpoint, headers=headers, timeout=10).json()
-            for row in response["data"]:
-                data.append(
-                    Model(
-                        id=row["id"],
-                        object="model",
-                        owned_by=row.get("owned_by", ""),
-                        created=row.get("created", round(time.time())),
-                        max_model_len=row.get("max_model_len", None),
-                        type=LANGUAGE_MODEL_TYPE,
-                    )
-                )
-
-        elif self.type == EMBEDDINGS_MODEL_TYPE:
-            endpoint = str(self.base_url).replace("/v1/", "/info")
-            response = requests.get(url=endpoint, headers=headers, timeout=10).json()
-            data.append(
-                Model(
-                    id=response["model_id"],
-                    object="model",
-                    owned_by="huggingface-text-embeddings-inference",
-                    max_model_len=response.get("max_input_length", None),
-                    created=round(time.time()),
-                    type=EMBEDDINGS_MODEL_TYPE,
-                )
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Model type not supported.")
-
-        return Models(data=data)
+        if model.id in clients["models"] and clients["models"][model.id].type != client.type:
+            LOGGER.error(f"Model id {model.id} is served with different types, skipping {client.base_url}.")  # fmt: off
+            return
+
+        # several model APIs serving the same model ID are replicas of this model
+        clients["models"].add(model.id, client)
+        # an upstream can serve several model IDs, each one has its own batcher
+        if client.type == EMBEDDINGS_MODEL_TYPE and model.id not in client.batchers:
+            client.batchers[model.id] = EmbeddingsBatcher(client=client, model=model.id, **dict(client.batching))  # fmt: off
+            client.batchers[model.id].start()
+
+    clients["registry"] = ModelRegistry(
+        on_register=register_model,
+        refresh_interval=CONFIG.caches.models.refresh_interval,
+        discovery_interval=CONFIG.caches.models.discovery_interval,
+    )
 
-    models = list()
     for model in CONFIG.models:
         client = OpenAI(base_url=model.url, api_key=model.key, timeout=10)
         client.type = model.type
-        client.models.list = partial(get_models_list, client)
-
-        try:
-            response = client.models.list()
-        except Exception as e:
-            LOGGER.info(f"error to request the model API on {model.url}, skipping:\n{e}")
-            continue
-
-        for model in response.data:
-            if model.id in models:
-                raise ValueError(f"Model id {model.id} is duplicated, not allowed.")
-            else:
-                models.append(model.id)
-
-            clients["models"][model.id] = client
+        client.batching, client.batchers = model.batching, dict()
+        client.inflight, client.failures, client.ejected_until = 0, 0, 0.0
+        client.admission = AdmissionController(**dict(model.admission)) if model.admission.max_concurrency else None  # fmt: off
+        # limits of the model API override the default limits
+        client.rate_limits = CONFIG.rate_limits.model_copy(update=model.rate_limits.model_dump(exclude_unset=True)) if model.rate_limits else CONFIG.rate_limits  # fmt: off
+        # long-lived connection pool shared by all requests forwarded to this upstream
+        client.async_client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {model.key}"},
+            timeout=model.timeout,
+            limits=httpx.Limits(
+                max_connections=model.pool.max_connections,
+                max_keepalive_connections=model.pool.max_keepalive_connections,
+                keepalive_expiry=model.pool.keepalive_expiry,
+            ),
+            http2=model.pool.http2,
+        )
+        clients["registry"].add(client)
 
+    # model APIs are requested concurrently, those not reachable before the deadline are
+    # registered later by the registry background task
+    await clients["registry"].refresh(timeout=CONFIG.caches.models.startup_timeout)
     if len(clients["models"].keys()) == 0:
-        raise ValueError("No model can be reached.")
+        LOGGER.warning("No model can be reached yet.")
+    clients["registry"].start()
 
     # cache
     if CONFIG.databases.cache.type == "redis":
-        from redis import Redis
+        from redis.asyncio import ConnectionPool, Redis
 
-        clients["cache"] = Redis(**CONFIG.databases.cache.args)
+        clients["cache"] = Redis(connection_pool=ConnectionPool(**CONFIG.databases.cache.args))
+        clients["rate_limiter"] = RateLimiter(redis=clients["cache"])
+        clients["usage"] = UsageMeter(redis=clients["cache"], **dict(CONFIG.metering))
+        clients["usage"].start()
+        clients["embeddings_cache"] = EmbeddingsCache(redis=clients["cache"], **dict(CONFIG.caches.embeddings))  # fmt: off
+        if CONFIG.caches.chat_completions.enabled:
+            clients["chat_completions_cache"] = ResponseCache(redis=clients["cache"], ttl=CONFIG.caches.chat_completions.ttl, max_size=CONFIG.caches.chat_completions.max_size)  # fmt: off
 
     # vectors
     if CONFIG.databases.vectors.type == "qdrant":
-        from qdrant_client import QdrantClient
+        from qdrant_client import AsyncQdrantClient
+
+        # gRPC is used when prefer_grpc is set in the arguments
+        clients["vectors"] = AsyncQdrantClient(**CONFIG.databases.vectors.args)
 
-        clients["vectors"] = QdrantClient(**CONFIG.databases.vectors.args)
-        clients["vectors"].url = CONFIG.databases.vectors.args["url"]
-        clients["vectors"].api_key = CONFIG.databases.vectors.args["api_key"]
+        for collection in [METADATA_COLLECTION, FILES_COLLECTION]:
+            if not await clients["vectors"].collection_exists(collection_name=collection):
+                await clients["vectors"].create_collection(
+                    collection_name=collection, vectors_config={}, on_disk_payload=False
+                )
+        await repair_payload_indexes(vectorstore=clients["vectors"])
 
-        if not clients["vectors"].collection_exists(collection_name=METADATA_COLLECTION):
-            clients["vectors"].create_collection(
-                collection_name=METADATA_COLLECTION, vectors_config={}, on_disk_payload=False
-            )
+        clients["collections"] = CollectionsCache(vectorstore=clients["vectors"], redis=clients["cache"], ttl=CONFIG.caches.collections.ttl)  # fmt: off
+        clients["collections"].start()
 
     # files
     if CONFIG.databases.files.type == "minio":
@@ -130,8 +162,27 @@ async def lifespan(app: FastAPI):
             from app.helpers import GristKeyManager
 
             clients["auth"] = GristKeyManager(redis=clients["cache"], **CONFIG.auth.args)
+            await clients["auth"].refresh()
+            clients["auth"].start()
     else:
         clients["auth"] = None
 
     yield  # release ressources when api shutdown
+
+    await clients["registry"].stop()
+    if clients["auth"]:
+        await clients["auth"].stop()
+
+    for client in clients["registry"].clients:
+        for batcher in client.batchers.values():
+            await batcher.stop()
+        await client.async_client.aclose()
+    if clients["collections"]:
+        await clients["collections"].stop()
+    if clients["usage"]:
+        await clients["usage"].stop()
+    if clients["vectors"]:
+        await clients["vectors"].close()
+    if clients["cache"]:
+        await clients["cache"].aclose()
     clients.clear()
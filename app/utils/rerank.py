@@ -0,0 +1,50 @@
+import asyncio
+from typing import List
+
+from fastapi import HTTPException
+import httpx
+
+from app.utils.lifespan import clients
+from app.utils.upstream import track, upstream_error
+from app.schemas.config import INTERACTIVE_PRIORITY
+
+
+async def _rerank(client, prompt: str, inputs: List[str], priority: int) -> List[float]:
+    async with track(client, priority=priority):
+        try:
+            response = await client.async_client.post(
+                url=str(client.base_url).replace("/v1/", "/rerank"),
+                json={"query": prompt, "texts": inputs, "truncate": True},
+            )
+        except httpx.TransportError as e:
+            raise upstream_error(e)
+        if response.is_error:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    scores = [0.0] * len(inputs)
+    for row in response.json():
+        scores[row["index"]] = row["score"]
+
+    return scores
+
+
+async def get_rerank(model: str, prompt: str, inputs: List[str], priority: int = INTERACTIVE_PRIORITY) -> List[float]:  # fmt: off
+    """
+    Score the relevance of texts to a prompt with a reranking model (HuggingFace Text Embeddings
+    Inference /rerank API). Texts are sent in concurrent batches of the batching size of the model.
+
+    Args:
+        model (str): The reranking model ID.
+        prompt (str): The prompt.
+        inputs (List[str]): Texts to score.
+        priority (int): Admission priority of the request.
+
+    Returns:
+        List[float]: Scores in the order of the inputs.
+    """
+    client = clients["models"][model]
+    size = client.batching.max_batch_size
+    batches = [inputs[i : i + size] for i in range(0, len(inputs), size)]
+    scores = await asyncio.gather(*[_rerank(client=client, prompt=prompt, inputs=batch, priority=priority) for batch in batches])  # fmt: off
+
+    return [score for batch in scores for score in batch]
@@ -1,14 +1,15 @@
-from typing import Annotated
+from typing import Annotated, Literal
 import hashlib
 import secrets
 import base64
 from functools import wraps
 
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.utils.lifespan import clients
 from app.schemas.collections import PUBLIC_COLLECTION_TYPE
+from app.schemas.config import BATCH_PRIORITY, INTERACTIVE_PRIORITY
 
 def encode_string(input: str) -> str:
     """
@@ -28,7 +29,7 @@ def encode_string(input: str) -> str:
     return hash
 
 
-def check_api_key(
+async def check_api_key(
     api_key: Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(scheme_name="API key"))],
 ) -> str:
     """
@@ -53,3 +54,27 @@ def check_api_key(
         user = "no-auth"
 
     return user
+
+
+def get_priority(
+    api_key: Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(scheme_name="API key"))],
+    priority: Annotated[
+        Literal["interactive", "batch"], Header(alias="X-Priority")
+    ] = "interactive",
+) -> int:
+    """
+    Get the admission priority of a request, to let interactive requests be admitted first when a
+    model is saturated. Keys with the batch role (see GristKeyManager) always have the batch
+    priority, other clients can lower their priority with a "X-Priority: batch" header.
+
+    Args:
+        api_key (Annotated[HTTPAuthorizationCredentials, Depends(HTTPBearer(scheme_name="API key")]): The API key.
+        priority (Literal["interactive", "batch"]): The X-Priority header, "interactive" by default.
+
+    Returns:
+        int: The admission priority, lower values are admitted first.
+    """
+    if clients["auth"] and clients["auth"].is_batch_key(api_key.credentials):
+        return BATCH_PRIORITY
+
+    return BATCH_PRIORITY if priority == "batch" else INTERACTIVE_PRIORITY
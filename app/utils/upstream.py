@@ -0,0 +1,214 @@
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+import httpx
+
+from app.helpers import SSEFramer
+from app.utils.config import LOGGER
+from app.schemas.config import INTERACTIVE_PRIORITY
+
+MAX_FAILURES = 3  # consecutive failures before a replica is ejected
+EJECTION_TIME = 30  # seconds before an ejected replica is readmitted
+
+
+def _failed(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, HTTPException) and error.status_code >= 500
+
+
+def upstream_error(error: httpx.TransportError) -> HTTPException:
+    """
+    Convert a network error with a model API into an HTTP error.
+    """
+    if isinstance(error, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail="Model API timeout.")
+    return HTTPException(status_code=502, detail=f"Model API not reachable: {error}")
+
+
+def release(client, error: Optional[BaseException] = None):
+    """
+    Release a request sent to a model replica and update its passive health state: after
+    MAX_FAILURES consecutive errors or timeouts, the replica is not selected during EJECTION_TIME.
+
+    Args:
+        client: The model client (see lifespan).
+        error (Optional[BaseException]): The error raised by the request, if any.
+    """
+    client.inflight -= 1
+    if isinstance(error, asyncio.CancelledError):
+        return  # abandoned by the caller (e.g. client disconnection), says nothing of the replica health
+
+    if error is None or not _failed(error):
+        client.failures = 0
+        return
+
+    client.failures += 1
+    if client.failures >= MAX_FAILURES:
+        LOGGER.warning(f"{client.base_url} ejected for {EJECTION_TIME}s after {client.failures} failures: {error}")  # fmt: off
+        client.ejected_until = time.monotonic() + EJECTION_TIME
+
+
+async def _admit(client, priority: int) -> Optional[float]:
+    client.inflight += 1
+    try:
+        return await client.admission.acquire(priority=priority) if client.admission else None
+    except BaseException:
+        # rejected (e.g. 429 queue full) or cancelled before reaching the replica, its health state is unchanged
+        client.inflight -= 1
+        raise
+
+
+@asynccontextmanager
+async def track(client, priority: int = INTERACTIVE_PRIORITY):
+    """
+    Count a request as outstanding on a model replica while it waits for admission and runs.
+
+    Args:
+        client: The model client (see lifespan).
+        priority (int): Admission priority of the request.
+    """
+    admitted_at = await _admit(client, priority=priority)
+    error = None
+    try:
+        yield
+    except BaseException as e:  # including cancellation
+        error = e
+        raise
+    finally:
+        if client.admission:
+            client.admission.release(admitted_at=admitted_at)
+        release(client, error=error)
+
+
+async def forward_request(
+    client, endpoint: str, request: dict, priority: int = INTERACTIVE_PRIORITY
+) -> dict:
+    """
+    Forward a request to a model API with the pooled async client of the model.
+
+    Args:
+        client: The model client (see lifespan).
+        endpoint (str): The endpoint relative to the model API base url (e.g. "chat/completions").
+        request (dict): The JSON body.
+        priority (int): Admission priority of the request.
+
+    Returns:
+        dict: The JSON response.
+    """
+    async with track(client, priority=priority):
+        try:
+            response = await client.async_client.post(url=f"{client.base_url}{endpoint}", json=request)  # fmt: off
+        except httpx.TransportError as e:
+            raise upstream_error(e)
+        if response.is_error:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    return response.json()
+
+
+class _StreamingResponse(StreamingResponse):
+    """
+    Streaming response that releases the upstream resources even if its body is never iterated
+    (e.g. the client disconnects before the stream starts).
+    """
+
+    def __init__(self, content, on_close: Callable[[BaseException], Awaitable], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # no-op if the body was iterated until its end, the request was abandoned otherwise
+            await self.on_close(asyncio.CancelledError())
+
+
+async def forward_stream(
+    client,
+    endpoint: str,
+    request: dict,
+    framer: Optional[SSEFramer] = None,
+    priority: int = INTERACTIVE_PRIORITY,
+    on_close: Optional[Callable[[], Awaitable]] = None,
+) -> StreamingResponse:
+    """
+    Forward a streamed request to a model API and return the server-sent events as they come.
+
+    The upstream response status is checked before streaming starts, so upstream errors are
+    returned with their status code instead of breaking the stream. The admission slot, the
+    upstream response and on_close are released when the stream ends, fails, or when the response
+    is done without its body being iterated.
+
+    Args:
+        client: The model client (see lifespan).
+        endpoint (str): The endpoint relative to the model API base url (e.g. "chat/completions").
+        request (dict): The JSON body.
+        framer (Optional[SSEFramer]): Framer applied on upstream events. Defaults to a framer that forwards events untouched.
+        priority (int): Admission priority of the request.
+        on_close (Optional[Callable[[], Awaitable]]): Coroutine function called when the stream is closed or fails to open.
+
+    Returns:
+        StreamingResponse: The event stream.
+    """
+    framer = framer or SSEFramer()
+    upstream = client.async_client.build_request(method="POST", url=f"{client.base_url}{endpoint}", json=request)  # fmt: off
+    try:
+        admitted_at = await _admit(client, priority=priority)
+    except BaseException:
+        if on_close:
+            await on_close()
+        raise
+
+    response, closed = None, False
+
+    async def close(error: Optional[BaseException] = None):
+        # called once, by the generator or by the response if the body was never iterated
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        try:
+            if response is not None:
+                await response.aclose()
+        finally:
+            if client.admission:
+                client.admission.release(admitted_at=admitted_at)
+            release(client, error=error)
+            if on_close:
+                await on_close()
+
+    try:
+        try:
+            response = await client.async_client.send(upstream, stream=True)
+        except httpx.TransportError as e:
+            raise upstream_error(e)
+        if response.is_error:
+            await response.aread()
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+    except BaseException as e:  # including cancellation
+        await close(error=e)
+        raise
+
+    async def generator():
+        error = None
+        try:
+            async for chunk in response.aiter_raw():
+                events = framer.feed(chunk)
+                if events:
+                    yield b"".join(events)
+            events = framer.flush()
+            if events:
+                yield b"".join(events)
+        except BaseException as e:  # including cancellation on client disconnection
+            error = e
+            raise
+        finally:
+            await close(error=error)
+
+    return _StreamingResponse(generator(), on_close=close, media_type="text/event-stream")